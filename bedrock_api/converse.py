@@ -1,11 +1,16 @@
-import boto3
 from dotenv import load_dotenv
 
+from common.bedrock_client import bedrock_runtime_client
+from converse_stream import stream
+
 load_dotenv()
 
-client = boto3.client("bedrock-runtime")
+# 接続プールとレート制限を共有するクライアント
+client = bedrock_runtime_client()
 
-response = client.converse(
+# converse_streamで生成されたテキストを順次表示
+response = stream(
+    client,
     modelId="us.anthropic.claude-3-7-sonnet-20250219-v1:0",
     messages=[{
         "role": "user",
@@ -15,7 +20,9 @@ response = client.converse(
     }]
 )
 
-for event in response.get('stream', []):
-    if 'contentBlockDelta' in event:
-        chunk = event['contentBlockDelta']['delta']['text']
-        print(chunk, end='')
\ No newline at end of file
+for event in response:
+    if event["type"] == "text":
+        print(event["text"], end='', flush=True)
+
+print()
+print(response.stats)
@@ -0,0 +1,125 @@
+import json
+import time
+
+
+class ConverseStream:
+    """converse_streamの応答を種類ごとのイベントに変換し、速度を計測する
+
+    イベントは次の形式のdict
+    - {"type": "text", "index": n, "text": ...}
+    - {"type": "reasoning", "index": n, "text": ...}
+    - {"type": "tool_use", "index": n, "toolUseId": ..., "name": ..., "input": ...(JSON断片)}
+    - {"type": "stop", "stopReason": ...}
+    ストリーム終了後、responseにconverseと同じ形の応答、statsに計測結果が入る
+    """
+
+    def __init__(self, client, **request):
+        self.client = client
+        self.request = request
+        self.response = None
+        self.stats = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        result = self.client.converse_stream(**self.request)
+        blocks = {}
+        tool_inputs = {}
+        delta_times = []
+        stop_reason = None
+        metadata = {}
+
+        for event in result["stream"]:
+            if "contentBlockStart" in event:
+                index = event["contentBlockStart"]["contentBlockIndex"]
+                tool_use = event["contentBlockStart"]["start"].get("toolUse")
+                if tool_use:
+                    blocks[index] = {"toolUse": {**tool_use, "input": {}}}
+                    tool_inputs[index] = ""
+
+            elif "contentBlockDelta" in event:
+                index = event["contentBlockDelta"]["contentBlockIndex"]
+                delta = event["contentBlockDelta"]["delta"]
+                delta_times.append(time.perf_counter())
+
+                if "text" in delta:
+                    block = blocks.setdefault(index, {"text": ""})
+                    block["text"] += delta["text"]
+                    yield {"type": "text", "index": index, "text": delta["text"]}
+
+                elif "reasoningContent" in delta:
+                    reasoning = delta["reasoningContent"]
+                    block = blocks.setdefault(index, {"reasoningContent": {"reasoningText": {"text": ""}}})
+                    if "text" in reasoning:
+                        block["reasoningContent"]["reasoningText"]["text"] += reasoning["text"]
+                        yield {"type": "reasoning", "index": index, "text": reasoning["text"]}
+                    if "signature" in reasoning:
+                        block["reasoningContent"]["reasoningText"]["signature"] = reasoning["signature"]
+                    if "redactedContent" in reasoning:
+                        blocks[index] = {"reasoningContent": {"redactedContent": reasoning["redactedContent"]}}
+
+                elif "toolUse" in delta:
+                    tool_use = blocks[index]["toolUse"]
+                    tool_inputs[index] += delta["toolUse"]["input"]
+                    yield {
+                        "type": "tool_use",
+                        "index": index,
+                        "toolUseId": tool_use["toolUseId"],
+                        "name": tool_use["name"],
+                        "input": delta["toolUse"]["input"],
+                    }
+
+            elif "contentBlockStop" in event:
+                index = event["contentBlockStop"]["contentBlockIndex"]
+                if index in tool_inputs:
+                    # ツール引数はJSON断片で届くため、ブロックの終わりでまとめて解釈する
+                    raw = tool_inputs.pop(index)
+                    blocks[index]["toolUse"]["input"] = json.loads(raw) if raw else {}
+
+            elif "messageStop" in event:
+                stop_reason = event["messageStop"]["stopReason"]
+                yield {"type": "stop", "stopReason": stop_reason}
+
+            elif "metadata" in event:
+                metadata = event["metadata"]
+
+        finished = time.perf_counter()
+        self.response = {
+            "output": {
+                "message": {
+                    "role": "assistant",
+                    "content": [blocks[index] for index in sorted(blocks)],
+                }
+            },
+            "stopReason": stop_reason,
+            "usage": metadata.get("usage", {}),
+            "metrics": metadata.get("metrics", {}),
+        }
+        self.stats = _stats(started, finished, delta_times, self.response["usage"])
+
+
+def _stats(started, finished, delta_times, usage):
+    """TTFT、チャンク間隔、出力速度を計算"""
+    gaps = [(b - a) * 1000 for a, b in zip(delta_times, delta_times[1:])]
+    output_tokens = usage.get("outputTokens", 0)
+    total = finished - started
+    return {
+        "ttft_ms": round((delta_times[0] - started) * 1000, 1) if delta_times else None,
+        "inter_token_ms_avg": round(sum(gaps) / len(gaps), 1) if gaps else None,
+        "inter_token_ms_max": round(max(gaps), 1) if gaps else None,
+        "total_ms": round(total * 1000, 1),
+        "output_tokens": output_tokens,
+        "tokens_per_sec": round(output_tokens / total, 1) if total > 0 else None,
+    }
+
+
+def stream(client, **request):
+    """converse_streamを呼び出し、イベントを順に受け取れるストリームを返す"""
+    return ConverseStream(client, **request)
+
+
+def converse(client, **request):
+    """ストリームを最後まで読み、converseと同じ形の応答と計測結果を返す"""
+    converse_stream = ConverseStream(client, **request)
+    for _ in converse_stream:
+        pass
+    return converse_stream.response, converse_stream.stats
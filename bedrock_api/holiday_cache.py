@@ -0,0 +1,135 @@
+import datetime
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+HOLIDAYS_URL = "https://holidays-jp.github.io/api/v1/{year}/date.json"
+
+
+class HolidayCache:
+    """年ごとの祝日一覧をメモリ(LRU)とJSONファイルにキャッシュする
+
+    過去の年は変わらないため期限なし、今年以降はTTLを過ぎたらETag/Last-Modifiedで再検証する
+    """
+
+    def __init__(self, path=None, ttl=None, size=None, timeout=10):
+        self.path = Path(path or os.getenv("HOLIDAY_CACHE_PATH", ".holidays_cache.json"))
+        self.ttl = ttl or float(os.getenv("HOLIDAY_CACHE_TTL", "86400"))
+        self.size = size or int(os.getenv("HOLIDAY_CACHE_SIZE", "32"))
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # 同じ年の取得は1回にまとめる
+        self._year_locks = {}
+        self._disk = self._load()
+
+    def _load(self):
+        """JSONファイルからキャッシュを読み込む"""
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """一時ファイルに書いてから置き換え、途中で壊れないようにする"""
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            tmp.write_text(json.dumps(self._disk, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def _is_fresh(self, year, entry):
+        if year < datetime.date.today().year:
+            return True
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def _lookup(self, year):
+        """メモリ→ディスクの順にエントリを探す"""
+        key = str(year)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+            return entry
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def _store(self, year, entry):
+        key = str(year)
+        with self._lock:
+            self._remember(key, entry)
+            self._disk[key] = entry
+            self._save()
+
+    def _fetch(self, year, entry):
+        """祝日APIを呼び出す(キャッシュがあれば条件付きリクエスト)"""
+        request = urllib.request.Request(HOLIDAYS_URL.format(year=year))
+        if entry is not None:
+            if entry.get("etag"):
+                request.add_header("If-None-Match", entry["etag"])
+            if entry.get("last_modified"):
+                request.add_header("If-Modified-Since", entry["last_modified"])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return {
+                    "holidays": json.loads(response.read()),
+                    "fetched_at": time.time(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and entry is not None:
+                # 変更なしなら取得時刻だけ更新する
+                return {**entry, "fetched_at": time.time()}
+            raise
+
+    def get(self, year):
+        """指定された年の祝日一覧を返す"""
+        year = int(year)
+        entry = self._lookup(year)
+        if entry is not None and self._is_fresh(year, entry):
+            return entry["holidays"]
+
+        with self._lock:
+            year_lock = self._year_locks.setdefault(year, threading.Lock())
+        with year_lock:
+            # 待っている間に他のスレッドが取得していればそれを使う
+            entry = self._lookup(year)
+            if entry is not None and self._is_fresh(year, entry):
+                return entry["holidays"]
+            try:
+                entry = self._fetch(year, entry)
+            except (urllib.error.URLError, OSError):
+                # 通信できない場合は期限切れのキャッシュでも返す
+                if entry is None:
+                    raise
+                return entry["holidays"]
+            self._store(year, entry)
+            return entry["holidays"]
+
+    def prefetch(self, start, end, max_workers=4):
+        """start年からend年までをまとめて取得し、取得できなかった年を返す"""
+        def fetch(year):
+            try:
+                self.get(year)
+            except (urllib.error.URLError, OSError):
+                return year
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [year for year in executor.map(fetch, range(start, end + 1)) if year is not None]
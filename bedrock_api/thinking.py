@@ -1,11 +1,17 @@
-import boto3
+import os
 from dotenv import load_dotenv
 
+from common.bedrock_client import bedrock_runtime_client
+from converse_stream import stream
+
 load_dotenv()
 
-client = boto3.client("bedrock-runtime")
+# 接続プールとレート制限を共有するクライアント
+client = bedrock_runtime_client()
 
-response = client.converse(
+# 思考過程と回答をストリーミングで表示
+response = stream(
+    client,
     modelId="us.anthropic.claude-3-7-sonnet-20250219-v1:0",
     messages=[{
         "role": "user",
@@ -16,15 +22,23 @@ response = client.converse(
     additionalModelRequestFields={
         "thinking": {
             "type": "enabled",
-            "budget_tokens": 1024
+            # thinking_benchmark.pyの結果を見て用途ごとに調整する
+            "budget_tokens": int(os.getenv("THINKING_BUDGET", "1024"))
         },
     },
 )
 
-for content in response["output"]["message"]["content"]:
-    if "reasoningContent" in content:
-        print("<thinking>")
-        print(content["reasoningContent"]["reasoningText"]["text"])
-        print("/thinking")
-    elif "text" in content:
-        print(content["text"])
\ No newline at end of file
+current = None
+for event in response:
+    if event["type"] not in ("reasoning", "text"):
+        continue
+    if event["type"] != current:
+        if current == "reasoning":
+            print("\n/thinking")
+        if event["type"] == "reasoning":
+            print("<thinking>")
+        current = event["type"]
+    print(event["text"], end='', flush=True)
+
+print()
+print(response.stats)
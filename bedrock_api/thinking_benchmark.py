@@ -0,0 +1,186 @@
+"""拡張思考のbudget_tokensごとのレイテンシを計測する
+
+bedrock_apiディレクトリで実行(bedrockはcommonを使うため、リポジトリのルートをPYTHONPATHに追加):
+    python thinking_benchmark.py --backend simulator --budgets 1024,2048,4096
+    PYTHONPATH=.. python thinking_benchmark.py --backend bedrock --csv thinking.csv
+"""
+import argparse
+import csv
+import random
+import statistics
+import time
+
+from converse_stream import stream
+
+
+DEFAULT_MODEL = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+
+DEFAULT_PROMPTS = [
+    "こんにちは",
+    "2025年の祝日のうち、月曜日にあたる日を数えて",
+    "AWS LambdaとAmazon ECSの使い分けを、コストと運用の観点で比較して",
+]
+
+
+class SimulatedThinkingClient:
+    """思考と回答のトークンを一定の速度で返す、converse_streamの代替"""
+
+    def __init__(self, first_token_ms=500.0, reasoning_rate=80.0, answer_rate=50.0,
+                 reasoning_per_char=40, answer_tokens=150, seed=0):
+        self.first_token_ms = first_token_ms
+        self.reasoning_rate = reasoning_rate
+        self.answer_rate = answer_rate
+        # 質問が長いほど多く考える(ただしbudget_tokensが上限)
+        self.reasoning_per_char = reasoning_per_char
+        self.answer_tokens = answer_tokens
+        self.random = random.Random(seed)
+
+    def converse_stream(self, messages, additionalModelRequestFields=None, **kwargs):
+        prompt = messages[-1]["content"][0]["text"]
+        thinking = (additionalModelRequestFields or {}).get("thinking", {})
+        budget = thinking.get("budget_tokens", 0) if thinking.get("type") == "enabled" else 0
+        demand = int(len(prompt) * self.reasoning_per_char * self.random.uniform(0.5, 1.5))
+        reasoning_tokens = min(budget, demand)
+        return {"stream": self._events(prompt, reasoning_tokens)}
+
+    def _events(self, prompt, reasoning_tokens):
+        time.sleep(self.first_token_ms / 1000)
+        for _ in range(reasoning_tokens):
+            time.sleep(1 / self.reasoning_rate)
+            yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"reasoningContent": {"text": "考"}}}}
+        index = 1 if reasoning_tokens else 0
+        for _ in range(self.answer_tokens):
+            time.sleep(1 / self.answer_rate)
+            yield {"contentBlockDelta": {"contentBlockIndex": index, "delta": {"text": "答"}}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": {
+            "inputTokens": len(prompt),
+            "outputTokens": reasoning_tokens + self.answer_tokens,
+        }}}
+
+
+def create_client(args):
+    """計測対象のバックエンドを作成"""
+    if args.backend == "simulator":
+        return SimulatedThinkingClient(
+            first_token_ms=args.first_token_ms,
+            reasoning_rate=args.reasoning_rate,
+            answer_rate=args.answer_rate,
+            answer_tokens=args.answer_tokens,
+        )
+    from dotenv import load_dotenv
+    from common.bedrock_client import bedrock_runtime_client
+    load_dotenv()
+    return bedrock_runtime_client()
+
+
+def run_once(client, model_id, prompt, budget, max_answer_tokens):
+    """1回分の呼び出しを計測"""
+    request = {
+        "modelId": model_id,
+        "messages": [{"role": "user", "content": [{"text": prompt}]}],
+        "inferenceConfig": {"maxTokens": budget + max_answer_tokens},
+    }
+    if budget:
+        request["additionalModelRequestFields"] = {
+            "thinking": {"type": "enabled", "budget_tokens": budget}
+        }
+
+    started = time.perf_counter()
+    first_answer = None
+    chars = {"reasoning": 0, "text": 0}
+    response = stream(client, **request)
+    for event in response:
+        if event["type"] in chars:
+            chars[event["type"]] += len(event["text"])
+        if event["type"] == "text" and first_answer is None:
+            first_answer = time.perf_counter()
+    latency = time.perf_counter() - started
+
+    # 使用量は思考と回答の合計しか返らないため、文字数の比で按分する
+    output_tokens = response.stats["output_tokens"]
+    total_chars = chars["reasoning"] + chars["text"]
+    reasoning_tokens = round(output_tokens * chars["reasoning"] / total_chars) if total_chars else 0
+    return {
+        "budget_tokens": budget,
+        "prompt": prompt,
+        "ttfa_ms": round((first_answer - started) * 1000, 1) if first_answer else None,
+        "latency_ms": round(latency * 1000, 1),
+        "reasoning_tokens": reasoning_tokens,
+        "answer_tokens": output_tokens - reasoning_tokens,
+        "tokens_per_sec": round(output_tokens / latency, 1) if latency > 0 else None,
+    }
+
+
+def summarize(rows):
+    """budget_tokensごとに集計"""
+    summary = []
+    for budget in sorted({row["budget_tokens"] for row in rows}):
+        group = [row for row in rows if row["budget_tokens"] == budget]
+        ttfas = [row["ttfa_ms"] for row in group if row["ttfa_ms"] is not None]
+        summary.append({
+            "budget_tokens": budget,
+            "runs": len(group),
+            "ttfa_p50": statistics.median(ttfas) if ttfas else float("nan"),
+            "latency_p50": statistics.median(row["latency_ms"] for row in group),
+            "latency_max": max(row["latency_ms"] for row in group),
+            "reasoning_avg": statistics.mean(row["reasoning_tokens"] for row in group),
+            "answer_avg": statistics.mean(row["answer_tokens"] for row in group),
+            "tokens_per_sec": statistics.mean(row["tokens_per_sec"] or 0 for row in group),
+        })
+    return summary
+
+
+def print_table(rows):
+    """結果を表形式で出力"""
+    columns = [
+        "budget_tokens", "runs", "ttfa_p50", "latency_p50", "latency_max",
+        "reasoning_avg", "answer_avg", "tokens_per_sec"
+    ]
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print(" | ".join(
+            f"{row[c]:>14}" if isinstance(row[c], int) else f"{row[c]:>14.1f}"
+            for c in columns
+        ))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["bedrock", "simulator"], default="simulator")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--budgets", default="1024,2048,4096",
+        type=lambda v: [int(b) for b in v.split(",")]
+    )
+    parser.add_argument("--prompts", help="1行1プロンプトのファイル(省略時は組み込みのプロンプト)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-answer-tokens", type=int, default=1024)
+    parser.add_argument("--first-token-ms", type=float, default=500.0)
+    parser.add_argument("--reasoning-rate", type=float, default=80.0)
+    parser.add_argument("--answer-rate", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--csv", default="thinking_benchmark.csv", help="計測結果を保存するパス")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    client = create_client(args)
+    rows = [
+        run_once(client, args.model, prompt, budget, args.max_answer_tokens)
+        for budget in args.budgets
+        for prompt in prompts
+        for _ in range(args.repeat)
+    ]
+
+    with open(args.csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print_table(summarize(rows))
@@ -1,21 +1,29 @@
-import boto3
-import json
-import urllib.request
+import datetime
+import os
 from dotenv import load_dotenv
 
+from common.bedrock_client import bedrock_runtime_client
+from holiday_cache import HolidayCache
+from tool_loop import ToolLoop
+
 load_dotenv()
 
-client = boto3.client("bedrock-runtime")
+# 接続プールとレート制限を共有するクライアント
+client = bedrock_runtime_client()
 
 user_input = "2025年7月の祝日はいつ？"
 llm = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
 
+#祝日一覧は年ごとにキャッシュし、起動時に前後の年を取得しておく
+holiday_cache = HolidayCache()
+this_year = datetime.date.today().year
+holiday_cache.prefetch(
+    int(os.getenv("HOLIDAY_PREFETCH_FROM", this_year - 1)),
+    int(os.getenv("HOLIDAY_PREFETCH_TO", this_year + 1))
+)
+
 def get_japanese_holidays(year):
-    URL = f"https://holidays-jp.github.io/api/v1/{year}/date.json"
-    with urllib.request.urlopen(URL) as response:
-        data = response.read()
-        holidays = json.loads(data)
-    return holidays
+    return holiday_cache.get(year)
 
 tools = [{
     "toolSpec": {
@@ -36,68 +44,40 @@ tools = [{
     }
 }]
 
-#1回目の推論
-print("[推論1回目]")
-print("ユーザーの入力: ", user_input)
-
-response = client.converse(
-    modelId=llm,
-    messages=[{
-        "role": "user",
-        "content": [{"text": user_input}]
-    }],
-    toolConfig={"tools": tools}
-)
-
-message = response["output"]["message"]
-print("LLMの回答: ", message["content"][0]["text"])
-
-tool_use = None
-for content_item in message["content"]:
-    if "toolUse" in content_item:
-        tool_use = content_item["toolUse"]
-        print("ツール要求: ", tool_use)
-        print()
-        break
-
-if tool_use:
-    year = tool_use["input"]["year"]
+def fetch_holidays(year):
     holidays = get_japanese_holidays(year)
-    tool_result = {
+    return {
         "year": year,
         "holidays": holidays,
         "count": len(holidays)
     }
-    print("[アプリから直接、ツールを実行して結果を取得]")
-    print(tool_result)
+
+#推論ごとの経過を表示
+rounds = 0
+def print_round(message, stats):
+    global rounds
+    rounds += 1
+    print(f"[推論{rounds}回目] {stats}")
+    for content_item in message["content"]:
+        if "text" in content_item:
+            print("LLMの回答: ", content_item["text"])
+        elif "toolUse" in content_item:
+            print("ツール要求: ", content_item["toolUse"])
     print()
 
-    messages = [
-        {
-            "role": "user",
-            "content": [{"text": user_input}]
-        },
-        {
-            "role": "assistant",
-            "content": message["content"]
-        },
-        {
-            "role": "user",
-            "content": [{
-                "toolResult": {
-                    "toolUseId": tool_use["toolUseId"],
-                    "content": [{
-                        "json": tool_result
-                    }]
-                }
-            }]
-        }
-    ]
+#ツール要求がなくなるまで推論とツール実行を繰り返す
+#1つの応答に含まれる複数のツール要求は並列に実行する
+print("ユーザーの入力: ", user_input)
+print()
 
-    final_response = client.converse(
-        modelId=llm,
-        messages=messages,
-        toolConfig={"tools": tools}
-    )
+loop = ToolLoop(client, llm, tools, {"get_japanese_holidays": fetch_holidays})
+try:
+    final_response, messages = loop.run([{
+        "role": "user",
+        "content": [{"text": user_input}]
+    }], on_round=print_round)
+finally:
+    loop.close()
 
-    output = final_response["output"]["message"]["content"][0]["text"]
\ No newline at end of file
+output = final_response["output"]["message"]["content"][0]["text"]
+print("最終回答: ", output)
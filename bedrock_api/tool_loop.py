@@ -0,0 +1,104 @@
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from converse_stream import converse
+
+
+class ToolLoop:
+    """stopReasonがtool_useでなくなるまでConverseとツール実行を繰り返す
+
+    実行中のスレッドは外から止められないため、timeoutはモデルへエラーを返すまでの時間で、
+    ツール自体は完了するまで動き続ける(通信などはツール側でもタイムアウトを設定すること)
+    """
+
+    def __init__(self, client, model_id, tool_specs, functions, max_workers=None, timeout=None, max_rounds=10):
+        self.client = client
+        self.model_id = model_id
+        self.tool_config = {"tools": tool_specs}
+        self.functions = functions
+        # ツールは上限付きのスレッドプールで並列に実行する
+        self.max_workers = max_workers or int(os.getenv("TOOL_MAX_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.timeout = timeout or float(os.getenv("TOOL_TIMEOUT", "30"))
+        self.max_rounds = max_rounds
+
+    def run_tools(self, tool_uses):
+        """1つのメッセージ内のtoolUseを並列に実行し、toolResultをまとめて返す"""
+        futures = [
+            (tool_use, time.monotonic() + self.timeout, self._submit(tool_use))
+            for tool_use in tool_uses
+        ]
+        results = []
+        hung = False
+        for tool_use, deadline, future in futures:
+            try:
+                output = future.result(timeout=max(deadline - time.monotonic(), 0))
+                results.append({"toolResult": {"toolUseId": tool_use["toolUseId"], "content": [_content(output)]}})
+            except TimeoutError:
+                # 実行前なら取り消せるが、実行中のものはワーカーを占有し続ける
+                hung = hung or not future.cancel()
+                results.append(_error(tool_use, f"{self.timeout}秒以内に完了しませんでした"))
+            except Exception as e:
+                results.append(_error(tool_use, f"{type(e).__name__}: {e}"))
+        if hung:
+            self._replace_executor()
+        return results
+
+    def _replace_executor(self):
+        """止まったツールのスレッドは残したまま、以降のツールは新しいプールで実行する"""
+        executor, self.executor = self.executor, ThreadPoolExecutor(max_workers=self.max_workers)
+        executor.shutdown(wait=False)
+
+    def _submit(self, tool_use):
+        function = self.functions.get(tool_use["name"])
+        if function is None:
+            # 未登録のツールも他のツールと同じくエラーのtoolResultとして返す
+            future = Future()
+            future.set_exception(KeyError(f"未登録のツールです: {tool_use['name']}"))
+            return future
+        return self.executor.submit(function, **tool_use["input"])
+
+    def run(self, messages, on_round=None):
+        """最終回答までループし、最後の応答と会話履歴を返す"""
+        messages = list(messages)
+        for _ in range(self.max_rounds):
+            response, stats = converse(
+                self.client,
+                modelId=self.model_id,
+                messages=messages,
+                toolConfig=self.tool_config
+            )
+            message = response["output"]["message"]
+            messages.append(message)
+            if on_round:
+                on_round(message, stats)
+            if response["stopReason"] != "tool_use":
+                return response, messages
+
+            tool_uses = [block["toolUse"] for block in message["content"] if "toolUse" in block]
+            messages.append({"role": "user", "content": self.run_tools(tool_uses)})
+        raise RuntimeError(f"{self.max_rounds}回のやり取りで回答が完了しませんでした")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _content(output):
+    """ツールの戻り値をtoolResultのcontentに変換(jsonはオブジェクトのみ受け付けるため、それ以外は包む)"""
+    if isinstance(output, dict):
+        return {"json": output}
+    if isinstance(output, list):
+        return {"json": {"result": output}}
+    return {"text": str(output)}
+
+
+def _error(tool_use, text):
+    """失敗したツールのtoolResult"""
+    return {
+        "toolResult": {
+            "toolUseId": tool_use["toolUseId"],
+            "content": [{"text": text}],
+            "status": "error",
+        }
+    }
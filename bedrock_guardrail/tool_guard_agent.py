@@ -1,4 +1,3 @@
-import boto3
 from typing import Literal
 from langchain.tools.retriever import create_retriever_tool
 from langchain.chat_models import init_chat_model
@@ -11,6 +10,9 @@ from langgraph.prebuilt import ToolNode
 from langgraph.types import Command
 from langfuse.langchain import CallbackHandler
 
+from common.bedrock_client import bedrock_runtime_client
+from common.graph_profiler import profile_graph
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -49,15 +51,16 @@ tool_node = ToolNode(tools)
 llm_with_tools = init_chat_model(
     model="us.amazon.nova-premier-v1:0",
     model_provider="bedrock_converse",
+    client=bedrock_runtime_client(),
 ).bind_tools(tools)
 
 # Bedrock Guardrailsを用いたNGワードの判定
-bedrock_runtime_client = boto3.client("bedrock-runtime")
+guardrail_client = bedrock_runtime_client()
 def check_tool_use(state: MessagesState) -> Command[Literal["tools"]]:
     tool_call = state["messages"][-1].tool_calls[0]
     if tool_call["name"] == "create_report_tool":
         report_text = tool_call["args"]["report_text"]
-        response = bedrock_runtime_client.apply_guardrail(
+        response = guardrail_client.apply_guardrail(
             guardrailIdentifier="d6n6slszc99j",
             guardrailVersion="DRAFT",
             source="OUTPUT",
@@ -100,7 +103,8 @@ workflow.add_node("check_tool_use", check_tool_use)
 workflow.add_edge(START, "agent")
 workflow.add_edge("tools", "agent")
 
-app = workflow.compile()
+# GRAPH_PROFILE=trueでノードごとの所要時間を計測
+app = profile_graph(workflow.compile())
 
 messages = app.invoke(
     {
@@ -113,3 +117,4 @@ messages = app.invoke(
 )
 
 messages["messages"][-1].pretty_print()
+app.report()
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+import boto3
+from botocore.config import Config
+
+
+logger = logging.getLogger(__name__)
+
+# スロットリングとして数えるエラーコード
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
+
+class TokenBucket:
+    """1分あたりの上限で補充されるトークンバケット"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount):
+        """必要な量を予約し、足りない分が補充されるまで待つ(待機秒数を返す)"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 先に差し引いておくことで、待機中の後続リクエストとの順序を保つ
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def refund(self, amount):
+        """見積もりと実績の差を戻す(マイナスなら追加で差し引く)"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelRateLimiter:
+    """モデルIDごとにリクエスト数/分とトークン数/分を制限する
+
+    上限はBEDROCK_RPM/BEDROCK_TPM(0で無制限)、モデルごとの上書きは
+    BEDROCK_RATE_LIMITS='{"モデルID": {"rpm": 50, "tpm": 200000}}'で指定する
+    """
+
+    def __init__(self, rpm=None, tpm=None, overrides=None, default_max_tokens=None):
+        self.rpm = rpm if rpm is not None else int(os.getenv("BEDROCK_RPM", "0"))
+        self.tpm = tpm if tpm is not None else int(os.getenv("BEDROCK_TPM", "0"))
+        self.overrides = overrides if overrides is not None else json.loads(
+            os.getenv("BEDROCK_RATE_LIMITS", "{}")
+        )
+        # maxTokens未指定の呼び出しで予約する出力トークン数
+        self.default_max_tokens = default_max_tokens or int(os.getenv("BEDROCK_DEFAULT_MAX_TOKENS", "1024"))
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"requests": 0, "throttles": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0})
+
+    def _buckets_for(self, model_id):
+        with self._lock:
+            if model_id not in self._buckets:
+                limits = self.overrides.get(model_id, {})
+                rpm = limits.get("rpm", self.rpm)
+                tpm = limits.get("tpm", self.tpm)
+                self._buckets[model_id] = (
+                    TokenBucket(rpm) if rpm else None,
+                    TokenBucket(tpm) if tpm else None,
+                )
+            return self._buckets[model_id]
+
+    def estimate_tokens(self, params):
+        """入力の文字数と出力上限から消費トークン数を見積もる"""
+        request = {key: params.get(key) for key in ("messages", "system", "body")}
+        input_tokens = len(json.dumps(request, default=str, ensure_ascii=False)) // 4
+        max_tokens = (params.get("inferenceConfig") or {}).get("maxTokens", self.default_max_tokens)
+        return input_tokens + max_tokens
+
+    def before_call(self, params, context, **kwargs):
+        """API呼び出し前に上限まで待機する(botocoreのイベントハンドラー)"""
+        model_id = params.get("modelId")
+        if model_id is None:
+            return
+        requests, tokens = self._buckets_for(model_id)
+        estimate = self.estimate_tokens(params)
+        wait = 0.0
+        if requests:
+            wait += requests.acquire(1)
+        if tokens:
+            wait += tokens.acquire(estimate)
+        context["rate_limit"] = (model_id, estimate)
+
+        wait_ms = wait * 1000
+        with self._lock:
+            stat = self._stats[model_id]
+            stat["requests"] += 1
+            stat["wait_ms_total"] += wait_ms
+            stat["wait_ms_max"] = max(stat["wait_ms_max"], wait_ms)
+        if wait:
+            logger.debug("bedrock_queue_wait_ms=%.1f model=%s", wait_ms, model_id)
+
+    def after_call(self, parsed, context, **kwargs):
+        """実際の使用量で見積もりを補正する(ストリーミングは使用量が後から届くため見積もりのまま)"""
+        if "rate_limit" not in context:
+            return
+        model_id, estimate = context["rate_limit"]
+        usage = parsed.get("usage")
+        _, tokens = self._buckets_for(model_id)
+        if usage and tokens:
+            tokens.refund(estimate - usage.get("inputTokens", 0) - usage.get("outputTokens", 0))
+
+    def needs_retry(self, response, request_dict, **kwargs):
+        """リトライされた試行も含めてスロットリングを数える(リトライ判定には関与しない)"""
+        if response is None:
+            return None
+        _, parsed = response
+        if parsed.get("Error", {}).get("Code") in THROTTLE_CODES:
+            model_id = (request_dict.get("context") or {}).get("rate_limit", (None,))[0]
+            self._throttled(model_id)
+        return None
+
+    def _throttled(self, model_id):
+        with self._lock:
+            self._stats[model_id]["throttles"] += 1
+        logger.warning("Bedrockのスロットリングが発生しました model=%s", model_id)
+
+    def stats(self):
+        """モデルごとのリクエスト数、スロットリング回数、待機時間"""
+        with self._lock:
+            return {
+                model_id: {
+                    **stat,
+                    "wait_ms_avg": stat["wait_ms_total"] / stat["requests"] if stat["requests"] else 0.0,
+                }
+                for model_id, stat in self._stats.items()
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_limiter = None
+
+
+def rate_limiter():
+    """プロセス内で共有するレートリミッター"""
+    global _limiter
+    with _clients_lock:
+        if _limiter is None:
+            _limiter = ModelRateLimiter()
+    return _limiter
+
+
+def bedrock_runtime_client(region_name=None):
+    """接続プールとレート制限を共有するbedrock-runtimeクライアント"""
+    limiter = rate_limiter()
+    region_name = region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION")
+    with _clients_lock:
+        if region_name not in _clients:
+            client = boto3.client(
+                "bedrock-runtime",
+                region_name=region_name,
+                config=Config(
+                    max_pool_connections=int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50")),
+                    read_timeout=int(os.getenv("BEDROCK_READ_TIMEOUT", "300")),
+                    retries={
+                        "mode": "adaptive",
+                        "max_attempts": int(os.getenv("BEDROCK_MAX_ATTEMPTS", "5")),
+                    },
+                ),
+            )
+            events = client.meta.events
+            events.register("before-parameter-build.bedrock-runtime", limiter.before_call)
+            events.register("after-call.bedrock-runtime", limiter.after_call)
+            events.register("needs-retry.bedrock-runtime", limiter.needs_retry)
+            _clients[region_name] = client
+    return _clients[region_name]
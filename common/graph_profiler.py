@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def _size(value):
+    """状態のおおよそのサイズ(バイト)"""
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False).encode())
+    except (TypeError, ValueError):
+        return len(repr(value).encode())
+
+
+def _node_key(metadata):
+    """ノード実行を一意に識別するキー"""
+    node = metadata.get("langgraph_node")
+    if node is None:
+        return None
+    return (
+        metadata.get("langgraph_checkpoint_ns", ""),
+        node,
+        metadata.get("langgraph_step"),
+    )
+
+
+class GraphProfiler(BaseCallbackHandler):
+    """コンパイル済みStateGraphのノード単位の所要時間と状態サイズを記録する"""
+
+    def __init__(self):
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        # 実行中のノードと、各runがどのノード実行に属するか
+        self._open = {}
+        self._run_keys = {}
+        self._llm_runs = {}
+
+    # ノードの開始と終了
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        key = _node_key(metadata or {})
+        with self._lock:
+            self._run_keys[run_id] = key
+            # 同じノード実行の内側のrunは無視し、最も外側だけを計測する
+            if key is None or key[1].startswith("__") or self._run_keys.get(parent_run_id) == key:
+                return
+            self._open[run_id] = {
+                "node": key[1],
+                "step": key[2],
+                "key": key,
+                "start": time.perf_counter() - self._origin,
+                "size_in": _size(inputs),
+                "llm": [],
+            }
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id, outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, None, error=repr(error))
+
+    def _close(self, run_id, outputs, error=None):
+        with self._lock:
+            self._run_keys.pop(run_id, None)
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span["end"] = time.perf_counter() - self._origin
+            span["size_out"] = _size(outputs)
+            if error:
+                span["error"] = error
+            self.spans.append(span)
+
+    # ノード内のLLM呼び出し
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._llm_start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._llm_start(run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._llm_end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._llm_end(run_id)
+
+    def _llm_start(self, run_id, metadata):
+        key = _node_key(metadata or {})
+        if key is not None:
+            with self._lock:
+                self._llm_runs[run_id] = (key, time.perf_counter() - self._origin)
+
+    def _llm_end(self, run_id):
+        with self._lock:
+            entry = self._llm_runs.pop(run_id, None)
+            if entry is None:
+                return
+            key, start = entry
+            for span in self._open.values():
+                if span["key"] == key:
+                    span["llm"].append((start, time.perf_counter() - self._origin))
+                    break
+
+    def transitions(self):
+        """ノード間の遷移回数"""
+        ordered = sorted(self.spans, key=lambda span: (span["step"] or 0, span["start"]))
+        return Counter(
+            (prev["node"], span["node"]) for prev, span in zip(ordered, ordered[1:])
+        )
+
+    def trace(self):
+        """Chromeトレース形式(Perfetto/speedscopeで表示可能)"""
+        events = []
+        for span in self.spans:
+            events.append({
+                "name": span["node"],
+                "cat": "node",
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": (span["end"] - span["start"]) * 1e6,
+                "pid": 1,
+                "tid": 1,
+                "args": {
+                    "step": span["step"],
+                    "size_in": span["size_in"],
+                    "size_out": span["size_out"],
+                },
+            })
+            for start, end in span["llm"]:
+                events.append({
+                    "name": "llm",
+                    "cat": "llm",
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": 1,
+                    "tid": 1,
+                })
+        return {"traceEvents": events}
+
+    def folded(self):
+        """フレームグラフ用のfolded形式(マイクロ秒)"""
+        weights = Counter()
+        for span in self.spans:
+            llm = sum(end - start for start, end in span["llm"])
+            local = span["end"] - span["start"] - llm
+            weights[f"graph;{span['node']}"] += int(local * 1e6)
+            if llm:
+                weights[f"graph;{span['node']};llm"] += int(llm * 1e6)
+        return "\n".join(f"{stack} {weight}" for stack, weight in weights.items())
+
+    def summary(self):
+        """ノードごとの集計表"""
+        stats = defaultdict(lambda: {"calls": 0, "total": 0.0, "llm": 0.0, "size_in": 0, "size_out": 0})
+        for span in self.spans:
+            stat = stats[span["node"]]
+            stat["calls"] += 1
+            stat["total"] += span["end"] - span["start"]
+            stat["llm"] += sum(end - start for start, end in span["llm"])
+            stat["size_in"] += span["size_in"]
+            stat["size_out"] += span["size_out"]
+
+        lines = [
+            f"{'node':<20}{'calls':>7}{'total ms':>12}{'llm ms':>12}{'local ms':>12}{'avg in B':>12}{'avg out B':>12}"
+        ]
+        for node, stat in stats.items():
+            calls = stat["calls"]
+            lines.append(
+                f"{node:<20}{calls:>7}{stat['total'] * 1e3:>12.1f}{stat['llm'] * 1e3:>12.1f}"
+                f"{(stat['total'] - stat['llm']) * 1e3:>12.1f}"
+                f"{stat['size_in'] // calls:>12}{stat['size_out'] // calls:>12}"
+            )
+        lines.append("")
+        lines.append("transitions")
+        for (source, target), count in self.transitions().most_common():
+            lines.append(f"  {source} -> {target}: {count}")
+        return "\n".join(lines)
+
+
+class ProfiledGraph:
+    """コンパイル済みグラフの呼び出しにプロファイラーを差し込むラッパー"""
+
+    def __init__(self, graph, enabled=None):
+        self.graph = graph
+        if enabled is None:
+            enabled = os.getenv("GRAPH_PROFILE", "false").lower() == "true"
+        self.profiler = GraphProfiler() if enabled else None
+
+    def _config(self, config):
+        if self.profiler is None:
+            return config
+        config = dict(config or {})
+        config["callbacks"] = [*(config.get("callbacks") or []), self.profiler]
+        return config
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.graph.invoke(input, self._config(config), **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.graph.ainvoke(input, self._config(config), **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        return self.graph.stream(input, self._config(config), **kwargs)
+
+    def astream(self, input, config=None, **kwargs):
+        return self.graph.astream(input, self._config(config), **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+
+    def report(self, path=None):
+        """集計表を表示し、トレースとfolded形式をファイルに書き出す"""
+        if self.profiler is None:
+            return
+        print(self.profiler.summary())
+        path = path or os.getenv("GRAPH_PROFILE_TRACE", "graph_trace.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.profiler.trace(), f)
+        with open(os.path.splitext(path)[0] + ".folded", "w", encoding="utf-8") as f:
+            f.write(self.profiler.folded())
+
+
+def profile_graph(graph, enabled=None):
+    """GRAPH_PROFILE=trueのときだけノード単位の計測を有効にする"""
+    return ProfiledGraph(graph, enabled)
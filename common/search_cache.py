@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Future
+
+from common.ttl_cache import TtlCache, normalize_query
+
+
+class SearchCache(TtlCache):
+    """検索結果のキャッシュ(メモリのLRU + SQLite)"""
+
+    def __init__(self, path=None, ttl=None, max_entries=None, max_disk_entries=None):
+        super().__init__(
+            path or os.getenv("SEARCH_CACHE_PATH") or os.path.join(
+                tempfile.gettempdir(), "search_cache.db"
+            ),
+            "results",
+            ttl or float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            max_entries or int(os.getenv("SEARCH_CACHE_SIZE", "256")),
+            max_disk_entries or int(os.getenv("SEARCH_CACHE_DISK_SIZE", "10000")),
+        )
+        # 同じクエリを同時に検索しないよう、実行中の検索を保持する
+        self._inflight = {}
+        self._ainflight = {}
+
+    def encode(self, value):
+        return json.dumps(value, ensure_ascii=False)
+
+    def decode(self, text):
+        return json.loads(text)
+
+    def key(self, query, params):
+        """正規化したクエリとパラメータからキーを作成"""
+        return json.dumps(
+            {"query": normalize_query(query), **params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+
+    def get(self, key):
+        """キャッシュ済みの結果を取得(なければNone)"""
+        return self.lookup([key])
+
+    def put(self, key, value):
+        """結果を保存"""
+        self.store([key], value)
+
+    def get_or_fetch(self, query, params, fetch):
+        """キャッシュになければ検索(同時に同じ検索が来たら結果を共有)"""
+        key = self.key(query, params)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                # 確認してからロックを取るまでに先行の検索が保存を終えていれば、その結果を使う
+                value = self._lookup_locked([key], time.time())
+                if value is not None:
+                    return value
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            value = fetch()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_fetch(self, query, params, fetch):
+        """get_or_fetchの非同期版(fetchはコルーチン関数)"""
+        key = self.key(query, params)
+        # SQLiteの読み書きでイベントループを止めないよう別スレッドで実行する
+        value = await asyncio.to_thread(self.get, key)
+        if value is not None:
+            return value
+
+        future = self._ainflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        # 読み込みを待つ間に先行の検索が保存を終えていれば、その結果を使う
+        # (保存はメモリにも載るため、ループを止めないようメモリだけを確認する)
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fetch()
+            await asyncio.to_thread(self.put, key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 待機者がいない場合に未取得の例外として警告されないようにする
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """プロセス内で共有するキャッシュを取得"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SearchCache()
+    return _default_cache
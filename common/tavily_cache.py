@@ -0,0 +1,25 @@
+from langchain_tavily import TavilySearch
+from langchain_tavily._utilities import TavilySearchAPIWrapper
+
+from common.search_cache import default_cache
+
+
+class CachedTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """検索結果をキャッシュするTavily APIラッパー"""
+
+    def raw_results(self, query, **kwargs):
+        search = super().raw_results
+        return default_cache().get_or_fetch(
+            query, kwargs, lambda: search(query=query, **kwargs)
+        )
+
+    async def raw_results_async(self, query, **kwargs):
+        search = super().raw_results_async
+        return await default_cache().aget_or_fetch(
+            query, kwargs, lambda: search(query=query, **kwargs)
+        )
+
+
+def cached_tavily_search(**kwargs):
+    """キャッシュ付きのTavilySearchツールを作成"""
+    return TavilySearch(api_wrapper=CachedTavilySearchAPIWrapper(), **kwargs)
@@ -0,0 +1,132 @@
+# 期限付きのキャッシュ(メモリのLRU + SQLite)
+# common/ttl_cache.pyが正で、AgentCoreのコンテナはmulti_agents/backendだけでビルドされるため
+# multi_agents/backend/ttl_cache.pyに同じ内容を複製している(変更したら両方を更新する)
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """表記ゆれを吸収したキーを作成"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?？。.!！ ")
+
+
+class TtlCache:
+    """メモリのLRUとSQLiteの2段で、期限付きの値を保持する"""
+
+    def __init__(self, path, table, ttl, max_entries, max_disk_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.table = table
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT, "
+            "expires_at REAL, accessed_at REAL)"
+        )
+        self._db.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_accessed_at "
+            f"ON {table} (accessed_at)"
+        )
+
+    def encode(self, value):
+        """SQLiteに保存する文字列へ変換"""
+        return value
+
+    def decode(self, text):
+        """SQLiteから読んだ文字列を値へ戻す"""
+        return text
+
+    def lookup(self, keys):
+        """いずれかのキーでキャッシュ済みの値を取得(なければNone)"""
+        with self._lock:
+            return self._lookup_locked(keys, time.time())
+
+    def peek(self, key):
+        """ロックを取らずにメモリだけを確認(LRUの順序は更新しない)"""
+        entry = self._memory.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def store(self, keys, value):
+        """同じ値を複数のキーで保存"""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            for key in keys:
+                self._put_memory(key, value, expires_at)
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                    (key, self.encode(value), expires_at, now)
+                )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def _lookup_locked(self, keys, now):
+        """ロックを取得済みの状態で、メモリ→ディスクの順に探す"""
+        for key in keys:
+            value = self._get_memory(key, now)
+            if value is None:
+                value = self._get_disk(key, now)
+            if value is not None:
+                return value
+        return None
+
+    def _get_memory(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_disk(self, key, now):
+        # 列名に依存しないよう位置で読む(旧形式のテーブルとも互換)
+        row = self._db.execute(
+            f"SELECT * FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        _, text, expires_at, _ = row
+        if expires_at <= now:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        self._db.execute(
+            f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._db.commit()
+        # ディスクから読んだ値はメモリにも載せる
+        value = self.decode(text)
+        self._put_memory(key, value, expires_at)
+        return value
+
+    def _evict_disk(self, now):
+        """期限切れと、上限を超えた古いエントリを削除"""
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)
+        )
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE key NOT IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_disk_entries,)
+        )
@@ -1,4 +1,3 @@
-import boto3
 import os
 from langfuse import observe
 from tavily import TavilyClient
@@ -6,7 +5,10 @@ from tavily import TavilyClient
 from dotenv import load_dotenv
 load_dotenv()
 
-bedrock_client = boto3.client("bedrock-runtime")
+from common.bedrock_client import bedrock_runtime_client
+from common.search_cache import default_cache
+
+bedrock_client = bedrock_runtime_client()
 model_id = "us.amazon.nova-premier-v1:0"
 
 # Web検索クエリ
@@ -39,9 +41,11 @@ tavily_client = TavilyClient(api_key=os.environ.get("TAVILY_API_KEY"))
 @observe
 def web_search(query: str):
     """Get content related the query from web."""
-    search_result = tavily_client.search(
-        query=query,
-        num_results=3,
+    # 同じ検索はキャッシュから返す
+    search_result = default_cache().get_or_fetch(
+        query,
+        {"num_results": 3},
+        lambda: tavily_client.search(query=query, num_results=3),
     )
 
     return [doc["content"] for doc in search_result["results"]]
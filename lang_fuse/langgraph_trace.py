@@ -1,13 +1,14 @@
 from langchain.chat_models import init_chat_model
-from langchain_tavily import TavilySearch
 from langgraph.prebuilt import create_react_agent
 from langfuse.langchain import CallbackHandler
 
 from dotenv import load_dotenv
 load_dotenv()
 
-# Web検索ツールの初期化
-web_search = TavilySearch(max_results=3, topic="general")
+from common.tavily_cache import cached_tavily_search
+
+# Web検索ツールの初期化(同じ検索はキャッシュから返す)
+web_search = cached_tavily_search(max_results=3, topic="general")
 
 # ReactAgentの構築
 tools = [web_search]
@@ -1,24 +1,28 @@
-from botocore.config import Config
+import os
 from langchain.chat_models import init_chat_model
 from langchain_community.agent_toolkits import FileManagementToolkit
-from langchain_tavily import TavilySearch
 from langchain_core.messages import (
     BaseMessage,
     AIMessage,
-    SystemMessage,
     ToolMessage,
     ToolCall
 )
 from langgraph.types import interrupt
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.func import entrypoint, task
 from langgraph.graph import add_messages
 from dotenv import load_dotenv
 
+from checkpointer import BoundedSqliteSaver
+from context_manager import ContextManager
+
+from common.bedrock_client import bedrock_runtime_client
+from common.tavily_cache import cached_tavily_search
+
 # 環境変数ロード
 load_dotenv(override=True)
 
-web_search_tool = TavilySearch(max_results=2, topic="general")
+# 同じ検索はキャッシュから返す
+web_search_tool = cached_tavily_search(max_results=2, topic="general")
 
 working_directory = "report"
 file_toolkit = FileManagementToolkit(
@@ -30,14 +34,11 @@ write_file_tool = file_toolkit.get_tools()[0]
 tools = [web_search_tool, write_file_tool]
 tools_by_name = {tool.name: tool for tool in tools}
 
-cfg = Config(
-    read_timeout=300
-)
-
 llm_with_tools = init_chat_model(
     model="us.amazon.nova-premier-v1:0",
     model_provider="bedrock_converse",
-    config=cfg
+    # read_timeout(既定300秒)、接続プール、リトライ、レート制限は共通クライアントで設定
+    client=bedrock_runtime_client()
 ).bind_tools(tools)
 
 system_prompt = """
@@ -50,12 +51,13 @@ system_prompt = """
   - レポート保存を拒否された場合、レポート作成を中止し、内容をユーザに直接伝えてください
 """
 
+# 古いツール結果の圧縮とプロンプトキャッシュを担う
+context_manager = ContextManager(system_prompt)
+
 # LLMを呼び出すタスク
 @task
 def invoke_llm(messages: list[BaseMessage]) -> AIMessage:
-    response = llm_with_tools.invoke(
-        [SystemMessage(content=system_prompt)] + messages
-    )
+    response = llm_with_tools.invoke(context_manager(messages))
     return response
 
 # ツールを実行するタスク
@@ -65,11 +67,11 @@ def use_tool(tool_call):
     observation = tool.invoke(tool_call["args"])
     return ToolMessage(content=observation, tool_call_id=tool_call["id"])
 
-# ユーザーにツール実行の承認を求める
-def ask_human(tool_call: ToolCall):
+# 承認画面に表示するツール情報を作成する
+def tool_display_data(tool_call: ToolCall):
     tool_name = tool_call["name"]
     tool_args = tool_call["args"]
-    tool_data = {"name": tool_name}
+    tool_data = {"id": tool_call["id"], "name": tool_name}
     if tool_name == web_search_tool.name:
         args = f'* ツール名\n'
         args += f'  * {tool_name}\n'
@@ -85,19 +87,51 @@ def ask_human(tool_call: ToolCall):
         args += f'  * {tool_args["file_path"]}'
         tool_data["html"] = tool_args["text"]
     tool_data["args"] = args
+    return tool_data
 
-    feedback = interrupt(tool_data)
-
-    if feedback == "APPROVE":
-        return tool_call
-    
+# ツール利用拒否をLLMに伝えるメッセージ
+def deny_message(tool_call: ToolCall):
     return ToolMessage(
         content="ツール利用が拒否されたため、処理を終了してください",
-        name=tool_name,
+        name=tool_call["name"],
         tool_call_id=tool_call["id"]
     )
 
-checkpointer = MemorySaver()
+# ユーザーにツール実行の承認を求める
+def ask_human(tool_call: ToolCall):
+    feedback = interrupt(tool_display_data(tool_call))
+
+    if feedback == "APPROVE":
+        return tool_call
+    
+    return deny_message(tool_call)
+
+# ユーザーに複数ツールの承認を1回の中断でまとめて求める
+# 再開時は {tool_call_id: "APPROVE" | "DENY"} を受け取る
+def ask_human_batch(tool_calls: list[ToolCall]):
+    decisions = interrupt(
+        {"tool_calls": [tool_display_data(tool_call) for tool_call in tool_calls]}
+    )
+    # 1件ずつの承認モードで始めたスレッドの "APPROVE" など、辞書以外で再開された場合はすべて拒否する
+    if not isinstance(decisions, dict):
+        decisions = {}
+
+    approved_tools = []
+    tool_deny_messages = []
+    for tool_call in tool_calls:
+        if decisions.get(tool_call["id"]) == "APPROVE":
+            approved_tools.append(tool_call)
+        else:
+            tool_deny_messages.append(deny_message(tool_call))
+    return approved_tools, tool_deny_messages
+
+# 複数のツール呼び出しを1回の中断でまとめて承認するモード
+batch_approval = os.getenv("BATCH_APPROVAL", "true").lower() == "true"
+
+# 完了済みスレッドを期限付きでディスクに保持する
+checkpointer = BoundedSqliteSaver.from_path(
+    os.getenv("CHECKPOINT_DB", "checkpoints.db")
+)
 @entrypoint(checkpointer)
 def agent(messages):
     # ai agentを呼び出す
@@ -112,12 +146,15 @@ def agent(messages):
         tool_deny_messages = []
 
         # tool実行の承認をユーザからもらう
-        for tool_call in llm_response.tool_calls:
-            feedback = ask_human(tool_call)
-            if isinstance(feedback, ToolMessage):
-                tool_deny_messages.append(feedback)
-            else:
-                approved_tools.append(feedback)
+        if batch_approval:
+            approved_tools, tool_deny_messages = ask_human_batch(llm_response.tool_calls)
+        else:
+            for tool_call in llm_response.tool_calls:
+                feedback = ask_human(tool_call)
+                if isinstance(feedback, ToolMessage):
+                    tool_deny_messages.append(feedback)
+                else:
+                    approved_tools.append(feedback)
 
         # 承認されたツールを実行する
         tool_futures = []
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import time
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+# スレッドの最終アクセス時刻と完了状態を管理するテーブル
+ACCESS_TABLE = """
+CREATE TABLE IF NOT EXISTS thread_access (
+    thread_id TEXT PRIMARY KEY,
+    accessed_at REAL NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """TTLとLRUで保持量に上限を設けたSQLiteチェックポインター"""
+
+    def __init__(
+        self,
+        conn,
+        ttl=None,
+        abandoned_ttl=None,
+        max_threads=None,
+        keep_checkpoints=None,
+        maintain_every=50,
+    ):
+        super().__init__(conn)
+        # 完了済みスレッドの保持期間と最大保持数
+        self.ttl = ttl or float(os.getenv("CHECKPOINT_TTL", "3600"))
+        self.max_threads = max_threads or int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+        # 承認待ちのまま放置されたスレッドの保持期間
+        self.abandoned_ttl = abandoned_ttl or float(os.getenv("CHECKPOINT_ABANDONED_TTL", "86400"))
+        # スレッドごとに残す直近のチェックポイント数
+        self.keep_checkpoints = keep_checkpoints or int(os.getenv("CHECKPOINT_KEEP", "3"))
+        self.maintain_every = maintain_every
+        self._puts = 0
+        with self.lock, self.conn:
+            self.conn.execute(ACCESS_TABLE)
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        """WALモードでデータベースを開く"""
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn, **kwargs)
+
+    def get_tuple(self, config):
+        result = super().get_tuple(config)
+        if result is not None:
+            self._touch(config["configurable"]["thread_id"])
+        return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        self._touch(thread_id)
+        self.compact(thread_id)
+
+        # 一定回数の書き込みごとに古いスレッドを削除
+        self._puts += 1
+        if self._puts % self.maintain_every == 0:
+            self.evict()
+        return result
+
+    def _touch(self, thread_id, finished=None):
+        """スレッドの最終アクセス時刻を更新"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO thread_access (thread_id, accessed_at) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET accessed_at = excluded.accessed_at",
+                (str(thread_id), time.time()),
+            )
+            if finished is not None:
+                self.conn.execute(
+                    "UPDATE thread_access SET finished = ? WHERE thread_id = ?",
+                    (int(finished), str(thread_id)),
+                )
+
+    def mark_finished(self, thread_id):
+        """スレッドの完了を記録し、途中経過のチェックポイントを削除"""
+        self._touch(thread_id, finished=True)
+        self.compact(thread_id, keep=1)
+
+    def compact(self, thread_id, keep=None):
+        """直近のチェックポイント以外を削除"""
+        keep = keep or self.keep_checkpoints
+        old_checkpoints = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?"
+        )
+        with self.lock, self.conn:
+            for table in ("writes", "checkpoints"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? "
+                    f"AND checkpoint_id IN ({old_checkpoints})",
+                    (str(thread_id), str(thread_id), keep),
+                )
+
+    def delete_thread(self, thread_id):
+        """スレッドのチェックポイントをすべて削除"""
+        with self.lock, self.conn:
+            for table in ("writes", "checkpoints", "thread_access"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),)
+                )
+
+    def evict(self):
+        """期限切れと上限超過のスレッドを削除"""
+        now = time.time()
+        with self.lock:
+            expired = self.conn.execute(
+                "SELECT thread_id FROM thread_access "
+                "WHERE (finished = 1 AND accessed_at < ?) OR accessed_at < ?",
+                (now - self.ttl, now - self.abandoned_ttl),
+            ).fetchall()
+            overflow = self.conn.execute(
+                "SELECT thread_id FROM thread_access WHERE finished = 1 "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            ).fetchall()
+        for (thread_id,) in set(expired + overflow):
+            self.delete_thread(thread_id)
+
+        # WALファイルが肥大化しないよう切り詰める
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
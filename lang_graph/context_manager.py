@@ -0,0 +1,122 @@
+import os
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+
+# Bedrockのプロンプトキャッシュのチェックポイント
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+def _shorten(value, max_chars):
+    """長い値を先頭だけ残して切り詰める"""
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= max_chars:
+        return value
+    return text[:max_chars] + f"\n...(以下{len(text) - max_chars}文字省略)"
+
+
+def _latest_tool_turn(messages, keep_latest):
+    """直近keep_latest回分のツール呼び出しが始まる位置"""
+    tool_turns = [
+        i for i, message in enumerate(messages)
+        if isinstance(message, AIMessage) and message.tool_calls
+    ]
+    if keep_latest == 0:
+        return len(messages)
+    if len(tool_turns) < keep_latest:
+        return 0
+    return tool_turns[-keep_latest]
+
+
+def trim_old_tool_results(keep_latest=1, max_chars=1000):
+    """直近以外のツール結果を切り詰めるステージ"""
+    def stage(messages):
+        boundary = _latest_tool_turn(messages, keep_latest)
+        compacted = []
+        for i, message in enumerate(messages):
+            if i < boundary and isinstance(message, ToolMessage):
+                message = message.model_copy(
+                    update={"content": _shorten(message.content, max_chars)}
+                )
+            compacted.append(message)
+        return compacted
+    return stage
+
+
+def trim_old_tool_args(keep_latest=1, max_chars=1000):
+    """直近以外のツール引数(HTMLレポートの下書きなど)を切り詰めるステージ"""
+    def shorten_args(args):
+        return {key: _shorten(value, max_chars) for key, value in args.items()}
+
+    def stage(messages):
+        boundary = _latest_tool_turn(messages, keep_latest)
+        compacted = []
+        for i, message in enumerate(messages):
+            if i < boundary and isinstance(message, AIMessage) and message.tool_calls:
+                tool_calls = [
+                    {**tool_call, "args": shorten_args(tool_call["args"])}
+                    for tool_call in message.tool_calls
+                ]
+                content = message.content
+                if isinstance(content, list):
+                    # Converse形式ではtool_useブロックにも引数が入っている
+                    content = [
+                        {**block, "input": shorten_args(block["input"])}
+                        if isinstance(block, dict) and block.get("type") == "tool_use"
+                        else block
+                        for block in content
+                    ]
+                message = message.model_copy(
+                    update={"tool_calls": tool_calls, "content": content}
+                )
+            compacted.append(message)
+        return compacted
+    return stage
+
+
+def enforce_token_budget(max_tokens):
+    """トークン数が予算に収まるまで古いやり取りを削除するステージ"""
+    def stage(messages):
+        messages = list(messages)
+        # 最初のユーザー入力と最後のやり取りは必ず残す
+        while count_tokens_approximately(messages) > max_tokens:
+            start = 1
+            end = start + 1
+            while end < len(messages) and isinstance(messages[end], ToolMessage):
+                end += 1
+            if end >= len(messages):
+                break
+            del messages[start:end]
+        return messages
+    return stage
+
+
+def default_stages():
+    """環境変数で調整できる標準の圧縮ステージ"""
+    keep_latest = int(os.getenv("CONTEXT_KEEP_TOOL_TURNS", "1"))
+    max_chars = int(os.getenv("CONTEXT_TOOL_MAX_CHARS", "1000"))
+    return [
+        trim_old_tool_results(keep_latest, max_chars),
+        trim_old_tool_args(keep_latest, max_chars),
+        enforce_token_budget(int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))),
+    ]
+
+
+class ContextManager:
+    """LLMに渡す会話履歴を圧縮する"""
+
+    def __init__(self, system_prompt, stages=None, prompt_cache=None):
+        self.stages = default_stages() if stages is None else stages
+        if prompt_cache is None:
+            prompt_cache = os.getenv("PROMPT_CACHE", "true").lower() == "true"
+        # キャッシュのプレフィックスはツール定義→システムプロンプトの順のため、
+        # システムプロンプトの後ろに置いたチェックポイントでツール定義もキャッシュされる
+        content = [{"type": "text", "text": system_prompt}]
+        if prompt_cache:
+            content.append(CACHE_POINT)
+        self.system_message = SystemMessage(content=content)
+
+    def __call__(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        for stage in self.stages:
+            messages = stage(messages)
+        return [self.system_message] + messages
@@ -1,31 +1,39 @@
 import asyncio
-import boto3
-import operator
 import os
 
 from langchain.chat_models import init_chat_model
-from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_tavily import TavilySearch
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 from pydantic import BaseModel
 from typing import Annotated, Dict, List, Union
 from dotenv import load_dotenv
 
+from common.graph_profiler import profile_graph
+from common.tavily_cache import cached_tavily_search
+from message_log import MessageLog, append_messages
+from sns_publisher import SnsPublisher
+
 
 # 環境変数ロード
 load_dotenv()
 
 # ツール定義
-web_search = TavilySearch(max_results=2)
+# 同じ検索はキャッシュから返す
+web_search = cached_tavily_search(max_results=2)
+
+# SNSクライアントは共有し、Publishはイベントループ外で実行する
+sns_publisher = SnsPublisher(
+    os.getenv("SNS_TOPIC_ARN"),
+    batch=os.getenv("SNS_BATCH", "false").lower() == "true",
+    flush_interval=float(os.getenv("SNS_FLUSH_INTERVAL", "1.0"))
+)
 
 @tool
-def send_aws_sns(text: str):
+async def send_aws_sns(text: str):
     """テキストをAWS SNSにPublishするツール"""
-    topic_arn = os.getenv("SNS_TOPIC_ARN")
-    sns_client = boto3.client("sns")
-    sns_client.publish(TopicArn=topic_arn, Message=text)
+    await sns_publisher.publish(text)
 
 tools = [web_search, send_aws_sns]
 
@@ -37,7 +45,8 @@ llm_with_tools = init_chat_model(
 
 # ステートの定義
 class AgentState(BaseModel):
-    messages: Annotated[list[AnyMessage], operator.add]
+    # 追記専用のログで、ステップごとのコピーと再検証を避ける
+    messages: Annotated[MessageLog, append_messages]
 
 builder = StateGraph(AgentState)
 
@@ -49,7 +58,7 @@ system_prompt = """
 
 async def agent(state: AgentState) -> Dict[str, List[AIMessage]]:
     response = await llm_with_tools.ainvoke(
-        [SystemMessage(system_prompt)] + state.messages
+        [SystemMessage(system_prompt), *state.messages]
     )
 
     return {"messages": [response]}
@@ -67,14 +76,20 @@ builder.add_edge(START, "agent")
 builder.add_conditional_edges("agent", route_node)
 builder.add_edge("tools", "agent")
 
-graph = builder.compile()
+# GRAPH_PROFILE=trueでノードごとの所要時間を計測
+graph = profile_graph(builder.compile())
 
 async def main():
     question = "LangGraphの基本を優しく解説して"
     response = await graph.ainvoke(
         {"messages": [HumanMessage(question)]}
     )
+    # バッチモードで送信待ちのメッセージを送り切る
+    failed = await sns_publisher.close()
+    if failed:
+        print(f"SNSに送信できなかったメッセージが{len(failed)}件あります")
     return response
 
 response = asyncio.run(main())
-print(response)
\ No newline at end of file
+print(response)
+graph.report()
\ No newline at end of file
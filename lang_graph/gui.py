@@ -1,9 +1,11 @@
+import os
+import time
 import uuid
 import streamlit as st
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessageChunk, HumanMessage
 from langgraph.types import Command
 
-from agent_core import agent
+from agent_core import agent, checkpointer
 
 
 def init_session_state():
@@ -27,24 +29,74 @@ def reset_session():
 #セッションの初期化を実行
 init_session_state()
 
+#トークン表示の1秒あたりの最大再描画回数
+RENDER_FPS = float(os.getenv("RENDER_FPS", "10"))
+
+class TokenStream:
+    """LLMのトークンを一定間隔でまとめて描画する"""
+    def __init__(self):
+        self.placeholder = None
+        self.chunks = []
+        self.last_render = 0.0
+
+    def add(self, message):
+        """トークンを追加し、前回の描画から間隔が空いていれば描画する"""
+        if isinstance(message.content, str):
+            texts = [message.content]
+        else:
+            texts = [
+                block.get("text", "") for block in message.content
+                if isinstance(block, dict) and block.get("type") == "text"
+            ]
+        self.chunks.extend(text for text in texts if text)
+        if not self.chunks:
+            return
+        if self.placeholder is None:
+            self.placeholder = st.chat_message("assistant").empty()
+        if time.monotonic() - self.last_render >= 1 / RENDER_FPS:
+            self.render()
+
+    def render(self):
+        """溜めたトークンを描画する"""
+        if self.placeholder is not None:
+            self.placeholder.markdown("".join(self.chunks))
+            self.last_render = time.monotonic()
+
+    def reset(self):
+        """LLM呼び出し1回分の表示を確定する"""
+        self.render()
+        self.placeholder = None
+        self.chunks = []
+
 def run_agent(input_data):
     """エージェントを実行し、結果を処理する"""
     config = {
         "configurable": {"thread_id": st.session_state.thread_id}
     }
+    tokens = TokenStream()
     with st.spinner("処理中...", show_time=True):
-        for chunk in agent.stream(
+        for mode, chunk in agent.stream(
             input_data,
-            stream_mode="updates",
+            stream_mode=["messages", "updates"],
             config=config
         ):
+            # LLMの生成途中のトークンを表示する
+            if mode == "messages":
+                message, metadata = chunk
+                if isinstance(message, AIMessageChunk) and metadata.get("langgraph_node") == "invoke_llm":
+                    tokens.add(message)
+                continue
+
             for task_name, result in chunk.items():
                 if task_name == "__interrupt__":
                     st.session_state.tool_info = result[0].value
                     st.session_state.waiting_for_approval = True
                 elif task_name == "agent":
                     st.session_state.final_result = result.content
+                    # 完了したスレッドは途中経過を破棄し、期限切れで削除する
+                    checkpointer.mark_finished(st.session_state.thread_id)
                 elif task_name == "invoke_llm":
+                    tokens.reset()
                     if isinstance(chunk["invoke_llm"].content, list):
                         for content in result.content:
                             if content["type"] == "text":
@@ -74,6 +126,30 @@ def feedback():
         #いずれかのボタンが押された場合
         return feedback_result
 
+def batch_feedback(tool_calls):
+    """複数ツールの承認可否をまとめて取得する関数"""
+    decisions = {}
+    for tool_data in tool_calls:
+        st.info(tool_data["args"])
+        if tool_data["name"] == "write_file":
+            with st.container(height=400):
+                st.html(tool_data["html"], width="stretch")
+        decisions[tool_data["id"]] = st.radio(
+            tool_data["name"],
+            ["APPROVE", "DENY"],
+            # 既定値は置かず、ツールごとに明示的な選択を求める
+            index=None,
+            key=f"decision_{tool_data['id']}",
+            horizontal=True
+        )
+
+    #すべてのツールの可否が選ばれるまで送信できない
+    undecided = any(decision is None for decision in decisions.values())
+    if st.button("送信", width="stretch", disabled=undecided):
+        st.session_state.waiting_for_approval = False
+        return decisions
+    return None
+
 def app():
     st.title("Webリサーチエージェント")
 
@@ -86,18 +162,34 @@ def app():
 
     # ツール承認の確認
     if st.session_state.waiting_for_approval and st.session_state.tool_info:
-        st.info(st.session_state.tool_info["args"])
-        if st.session_state.tool_info["name"] == "write_file":
-            with st.container(height=400):
-                st.html(st.session_state.tool_info["html"], width="stretch")
-        feedback_result = feedback()
-        if feedback_result:
-            st.chat_message("user").write(feedback_result)
-            st.session_state.messages.append(
-                {"role": "user", "content": feedback_result}
-            )
-            run_agent(Command(resume=feedback_result))
-            st.rerun()
+        tool_info = st.session_state.tool_info
+        # 複数のツール呼び出しをまとめて承認する
+        if "tool_calls" in tool_info:
+            decisions = batch_feedback(tool_info["tool_calls"])
+            if decisions:
+                summary = "\n".join(
+                    f"* {tool_data['name']}: {decisions[tool_data['id']]}"
+                    for tool_data in tool_info["tool_calls"]
+                )
+                st.chat_message("user").write(summary)
+                st.session_state.messages.append(
+                    {"role": "user", "content": summary}
+                )
+                run_agent(Command(resume=decisions))
+                st.rerun()
+        else:
+            st.info(tool_info["args"])
+            if tool_info["name"] == "write_file":
+                with st.container(height=400):
+                    st.html(tool_info["html"], width="stretch")
+            feedback_result = feedback()
+            if feedback_result:
+                st.chat_message("user").write(feedback_result)
+                st.session_state.messages.append(
+                    {"role": "user", "content": feedback_result}
+                )
+                run_agent(Command(resume=feedback_result))
+                st.rerun()
     
     # ユーザ入力エリア
     if not st.session_state.waiting_for_approval:
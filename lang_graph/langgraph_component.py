@@ -1,13 +1,15 @@
-import operator
 from pydantic import BaseModel
 from typing import Annotated, Literal, Dict, Any
 from langgraph.graph import StateGraph, START, END
 
+from common.graph_profiler import profile_graph
+from message_log import MessageLog, append_log
+
 
 #ステートの定義
 class State(BaseModel):
     id: int
-    messages: Annotated[list[str], operator.add]
+    messages: Annotated[MessageLog, append_log]
 
 builder = StateGraph(State)
 
@@ -38,7 +40,9 @@ builder.add_conditional_edges("WebSearch", routing_function)
 builder.add_edge("Summarizer", END)
 builder.add_edge("Recorder", END)
 
-graph = builder.compile()
+#GRAPH_PROFILE=trueでノードごとの所要時間を計測
+graph = profile_graph(builder.compile())
 
 response = graph.invoke({"id": 123, "messages": ["start"]})
 print(response)
+graph.report()
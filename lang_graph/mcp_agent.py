@@ -1,7 +1,8 @@
 import asyncio
-import operator
+import os
+from pathlib import Path
 from langchain.chat_models import init_chat_model
-from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
@@ -9,6 +10,9 @@ from pydantic import BaseModel
 from typing import Annotated, Dict, List, Union
 from dotenv import load_dotenv
 
+from mcp_manifest import McpToolManifest
+from message_log import MessageLog, append_messages
+
 # 環境変数ロード
 load_dotenv()
 
@@ -16,27 +20,34 @@ mcp_client = None
 tools = None
 llm_with_tools = None
 
+SERVERS = {
+    # File System MCP Server
+    "file-system": {
+        "command": "npx",
+        "args": ["-y", "@modelcontextprotocol/server-filesystem", "./"],
+        "transport": "stdio",
+    },
+    # AWS Knowledge MCP Server
+    "aws-knowledge": {
+        "url": "https://knowledge-mcp.global.api.aws",
+        "transport": "streamable_http",
+    }
+}
+
+# ツール定義のキャッシュファイル
+MANIFEST_PATH = os.getenv(
+    "MCP_TOOL_CACHE", str(Path(__file__).with_name(".mcp_tools_cache.json"))
+)
+
 async def init_llm():
     """MCPクライアントとツールを初期化する"""
     global mcp_client, tools, llm_with_tools
 
-    mcp_client = MultiServerMCPClient(
-        {
-            # File System MCP Server
-            "file-system": {
-                "command": "npx",
-                "args": ["-y", "@modelcontextprotocol/server-filesystem", "./"],
-                "transport": "stdio",
-            },
-            # AWS Knowledge MCP Server
-            "aws-knowledge": {
-                "url": "https://knowledge-mcp.global.api.aws",
-                "transport": "streamable_http",
-            }
-        }
-    )
+    mcp_client = MultiServerMCPClient(SERVERS)
 
-    tools = await mcp_client.get_tools()
+    # キャッシュ済みのツール定義で即座にバインドし、MCPサーバへは初回のツール実行時に接続する
+    manifest = McpToolManifest(mcp_client, SERVERS, MANIFEST_PATH)
+    tools = await manifest.get_tools()
     llm_with_tools = init_chat_model(
         model="us.amazon.nova-premier-v1:0",
         model_provider="bedrock_converse"
@@ -44,7 +55,8 @@ async def init_llm():
 
 # ステートの定義
 class AgentState(BaseModel):
-    messages: Annotated[list[AnyMessage], operator.add]
+    # 追記専用のログで、ステップごとのコピーと再検証を避ける
+    messages: Annotated[MessageLog, append_messages]
 
 system_prompt = """
 あなたの責務はAWSドキュメントを検索し、Markdown形式でファイル出力することです。
@@ -54,7 +66,7 @@ system_prompt = """
 
 async def agent(state: AgentState) -> Dict[str, List[AIMessage]]:
     response = await llm_with_tools.ainvoke(
-        [SystemMessage(system_prompt)] + state.messages
+        [SystemMessage(system_prompt), *state.messages]
     )
 
     return {"messages": [response]}
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from langchain_core.tools import StructuredTool, ToolException
+
+
+logger = logging.getLogger(__name__)
+
+# キャッシュファイルの形式を変えたら上げる
+MANIFEST_FORMAT = 2
+
+
+class McpToolManifest:
+    """MCPツール定義のキャッシュと、実接続の遅延確立を担う"""
+
+    def __init__(self, client, servers, path, ttl=None):
+        self.client = client
+        self.servers = servers
+        self.path = Path(path)
+        # サーバ設定が変わればキャッシュを無効にする
+        self.version = hashlib.sha256(
+            json.dumps({"format": MANIFEST_FORMAT, "servers": servers}, sort_keys=True).encode()
+        ).hexdigest()
+        # サーバ側でのツールの追加・改名・削除を拾えるよう、期限を過ぎたら取り直す
+        self.ttl = ttl if ttl is not None else float(os.getenv("MCP_TOOL_CACHE_TTL", "86400"))
+        # 接続はサーバごとに管理し、1つの失敗が他のサーバのツールに波及しないようにする
+        self._tools = {}
+        self._entries = {}
+        self._locks = {name: asyncio.Lock() for name in servers}
+
+    def _read(self):
+        """キャッシュファイルをサーバごとの辞書で読み込む"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != self.version:
+            return {}
+        return data["servers"]
+
+    def _write(self, servers):
+        """一時ファイルに書いてから置き換え、途中で壊れないようにする"""
+        data = {"version": self.version, "servers": servers}
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("ツール定義のキャッシュを書き込めませんでした: %r", e)
+
+    def load(self):
+        """期限内のツール定義をサーバごとに読み込む"""
+        now = time.time()
+        return {
+            name: cached["tools"]
+            for name, cached in self._read().items()
+            if name in self.servers and now - cached["fetched_at"] < self.ttl
+        }
+
+    def save(self, name, entries):
+        """1つのサーバのツール定義をキャッシュファイルに書き込む"""
+        servers = self._read()
+        servers[name] = {"fetched_at": time.time(), "tools": entries}
+        self._write(servers)
+
+    def invalidate(self, name):
+        """サーバの接続とキャッシュを破棄し、次の呼び出しで取り直す"""
+        self._tools.pop(name, None)
+        self._entries.pop(name, None)
+        servers = self._read()
+        if servers.pop(name, None) is not None:
+            self._write(servers)
+
+    async def connect_server(self, name):
+        """1つのサーバに接続し、実ツールを取得する(失敗した場合は次の呼び出しで再接続)"""
+        async with self._locks[name]:
+            if name not in self._tools:
+                tools = await self.client.get_tools(server_name=name)
+                self._tools[name] = {tool.name: tool for tool in tools}
+                self._entries[name] = [
+                    {
+                        "server": name,
+                        "name": tool.name,
+                        "description": tool.description,
+                        "args_schema": tool.args_schema if isinstance(tool.args_schema, dict)
+                        else tool.args_schema.model_json_schema(),
+                    }
+                    for tool in tools
+                ]
+                # 取得できたサーバの分だけキャッシュを最新化する
+                self.save(name, self._entries[name])
+        return self._tools[name]
+
+    async def connect(self, names=None):
+        """サーバに並列で接続し、接続できなかったサーバと例外を返す"""
+        names = list(self.servers if names is None else names)
+        results = await asyncio.gather(
+            *(self.connect_server(name) for name in names), return_exceptions=True
+        )
+        failures = {}
+        for name, result in zip(names, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.warning("MCPサーバ「%s」に接続できませんでした: %r", name, result)
+                failures[name] = result
+        return failures
+
+    def _proxy(self, entry):
+        """初回呼び出し時に実接続するツールを作成"""
+        async def call(**kwargs):
+            # 呼び出されたツールのサーバにだけ接続する
+            tools = await self.connect_server(entry["server"])
+            tool = tools.get(entry["name"])
+            if tool is None:
+                # サーバ側で改名・削除されたツールは、キャッシュを破棄してモデルにエラーとして返す
+                self.invalidate(entry["server"])
+                raise ToolException(
+                    f"ツール「{entry['name']}」はMCPサーバ「{entry['server']}」に存在しません"
+                )
+            return await tool.ainvoke(kwargs)
+
+        return StructuredTool(
+            name=entry["name"],
+            description=entry["description"],
+            args_schema=entry["args_schema"],
+            coroutine=call,
+            handle_tool_error=True,
+        )
+
+    async def get_tools(self):
+        """キャッシュがあれば接続せずにツールを返す"""
+        cached = self.load()
+        # キャッシュがない、または期限切れのサーバにだけ接続する
+        missing = [name for name in self.servers if name not in cached]
+        if missing:
+            failures = await self.connect(missing)
+            if failures and len(failures) == len(self.servers):
+                raise next(iter(failures.values()))
+        # 接続できたサーバのツールだけを使う
+        entries = [
+            entry
+            for name in self.servers
+            for entry in cached.get(name, self._entries.get(name, []))
+        ]
+        return [self._proxy(entry) for entry in entries]
@@ -0,0 +1,99 @@
+from collections.abc import Sequence
+from langchain_core.messages import BaseMessage, convert_to_messages
+from pydantic_core import core_schema
+
+
+class MessageLog(Sequence):
+    """追記専用のログ。各ステップの値は共有リストの先頭n件を指すビューになる"""
+
+    __slots__ = ("_items", "_size")
+
+    def __init__(self, items=(), _shared=None, _size=None):
+        self._items = list(items) if _shared is None else _shared
+        self._size = len(self._items) if _size is None else _size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._items[:self._size][index]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("MessageLog index out of range")
+        return self._items[index]
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._items[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (MessageLog, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"MessageLog({list(self)!r})"
+
+    def __add__(self, other):
+        return self.extend(other)
+
+    def __radd__(self, other):
+        # [SystemMessage(...)] + state.messages のような既存の書き方に対応
+        return list(other) + list(self)
+
+    def __reduce__(self):
+        return (MessageLog, (list(self),))
+
+    def extend(self, items):
+        """末尾に追記した新しいビューを返す(既存のビューは変化しない)"""
+        items = list(items)
+        if not items:
+            return self
+        if self._size == len(self._items):
+            # 最新のビューなら共有リストに追記するだけで済む
+            self._items.extend(items)
+            return MessageLog(_shared=self._items, _size=self._size + len(items))
+        # 過去のビューから分岐する場合のみコピーする
+        return MessageLog(list(self) + items)
+
+    def since(self, start):
+        """start件目以降に追記された要素(チェックポイントへの差分書き込み用)"""
+        return self._items[start:self._size]
+
+    @classmethod
+    def _validate(cls, value):
+        # 検証済みのログはそのまま受け取り、全件の再検証を避ける
+        if isinstance(value, MessageLog):
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls(value)
+        raise TypeError(f"MessageLogに変換できません: {type(value).__name__}")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(list),
+        )
+
+
+def append_log(left, right):
+    """operator.addの代わりに使う追記専用のreducer"""
+    if not isinstance(left, MessageLog):
+        left = MessageLog(left or ())
+    if not isinstance(right, (list, tuple, MessageLog)):
+        right = [right]
+    return left.extend(right)
+
+
+def append_messages(left, right):
+    """新しく追加されたメッセージだけを変換・検証して追記するreducer"""
+    if not isinstance(right, (list, tuple, MessageLog)):
+        right = [right]
+    right = [
+        message if isinstance(message, BaseMessage) else convert_to_messages([message])[0]
+        for message in right
+    ]
+    return append_log(left, right)
@@ -1,24 +1,30 @@
+import operator
+from typing import Annotated
 from langchain_core.messages import AIMessage
-from langchain.chat_models import init_chat_model
 from langgraph.types import Command
 from langgraph.graph import StateGraph, MessagesState, START, END
 
+from common.graph_profiler import profile_graph
+from router import create_router, route
 
-# モデルを設定
-model = init_chat_model(
-    model="us.amazon.nova-premier-v1:0",
-    model_provider="bedrock_converse"
-)
+
+# ルーターを設定(ROUTER_BACKEND=local/model/structured)
+router = create_router()
+
+# ステートの定義(各ホップで使ったルーターを記録)
+class NetworkState(MessagesState):
+    routes: Annotated[list[dict], operator.add]
 
 # AIエージェント作成(サイコロを振って行き先を決定)
 def create_agent(name, odd_target, even_target):
     def agent(state):
-        dice = int(str(model.invoke("1から6のサイコロを1つ振って、数字だけ答えて").content).strip())
-        is_odd = dice % 2 == 1
-        next_agent = odd_target if is_odd else even_target
-        content = f"{name}: {dice}が出たので{next_agent}へ進みます！"
+        next_agent, hop = route(router, odd_target, even_target)
+        content = f"{name}: {hop['dice']}が出たので{next_agent}へ進みます！"
         print(content)
-        return Command(goto=next_agent, update={"messages": [AIMessage(content=content)]})
+        return Command(
+            goto=next_agent,
+            update={"messages": [AIMessage(content=content)], "routes": [{"agent": name, **hop}]}
+        )
     
     return agent
 
@@ -26,11 +32,15 @@ agent_1 = create_agent("Agent 1", "agent_3", "agent_2")
 agent_2 = create_agent("Agent 2", "agent_3", END)
 agent_3 = create_agent("Agent 3", END, "agent_2")
 
-builder = StateGraph(MessagesState)
+builder = StateGraph(NetworkState)
 builder.add_node("agent_1", agent_1)
 builder.add_node("agent_2", agent_2)
 builder.add_node("agent_3", agent_3)
 builder.add_edge(START, "agent_1")
-network = builder.compile()
+# GRAPH_PROFILE=trueでノードごとの所要時間と遷移回数を計測
+network = profile_graph(builder.compile())
 
-network.invoke({ "messages": [] })
+response = network.invoke({ "messages": [], "routes": [] })
+for hop in response["routes"]:
+    print(f"{hop['agent']}: backend={hop['backend']} {hop['ms']}ms")
+network.report()
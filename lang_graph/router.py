@@ -0,0 +1,93 @@
+import os
+import random
+import re
+import time
+from langchain.chat_models import init_chat_model
+from pydantic import BaseModel, Field
+
+
+DICE_PROMPT = "1から6のサイコロを1つ振って、数字だけ答えて"
+
+
+class DiceRoll(BaseModel):
+    """サイコロの出目"""
+    value: int = Field(ge=1, le=6, description="1から6の出目")
+
+
+class LocalRouter:
+    """LLMを呼ばずにローカルの乱数で出目を決める(シード指定で再現可能)"""
+    name = "local"
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def roll(self):
+        return self.random.randint(1, 6)
+
+
+class ModelRouter:
+    """小さいモデルに出目を答えさせ、応答から数字を抜き出す"""
+    name = "model"
+
+    def __init__(self, model):
+        self.model = model
+        self.fallback = None
+        self.last_backend = self.name
+
+    def roll(self):
+        content = str(self.model.invoke(DICE_PROMPT).content)
+        # 「1から6のサイコロを振ると4」のように質問を繰り返す応答もあるため、
+        # 他の数字の一部ではない1桁の出目のうち最後のものを採用する
+        matches = re.findall(r"(?<!\d)[1-6](?!\d)", content)
+        if matches:
+            self.last_backend = self.name
+            return int(matches[-1])
+        # 読み取れなければ構造化出力で聞き直す
+        if self.fallback is None:
+            self.fallback = StructuredRouter(self.model)
+        self.last_backend = self.fallback.name
+        return self.fallback.roll()
+
+
+class StructuredRouter:
+    """構造化出力で1から6の整数だけを返させる"""
+    name = "structured"
+
+    def __init__(self, model):
+        self.model = model.with_structured_output(DiceRoll)
+
+    def roll(self):
+        return self.model.invoke(DICE_PROMPT).value
+
+
+def create_router(backend=None):
+    """ROUTER_BACKEND(local/model/structured)に応じたルーターを作成"""
+    backend = backend or os.getenv("ROUTER_BACKEND", "local")
+    if backend == "local":
+        seed = os.getenv("ROUTER_SEED")
+        return LocalRouter(int(seed) if seed is not None else None)
+
+    model = init_chat_model(
+        model=os.getenv("ROUTER_MODEL", "us.amazon.nova-micro-v1:0"),
+        model_provider="bedrock_converse"
+    )
+    if backend == "model":
+        return ModelRouter(model)
+    if backend == "structured":
+        return StructuredRouter(model)
+    raise ValueError(f"未対応のルーターです: {backend}")
+
+
+def route(router, odd_target, even_target):
+    """出目の偶奇で行き先を決め、使ったバックエンドと所要時間も返す"""
+    started = time.perf_counter()
+    dice = router.roll()
+    next_agent = odd_target if dice % 2 == 1 else even_target
+    hop = {
+        "dice": dice,
+        "next": next_agent,
+        # フォールバックした場合は実際に使ったバックエンドを記録する
+        "backend": getattr(router, "last_backend", router.name),
+        "ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    return next_agent, hop
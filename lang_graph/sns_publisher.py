@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+def sns_client():
+    """接続プールを共有するSNSクライアント
+
+    SNS_ENDPOINT_URLを指定するとローカルの代替サーバ(LocalStackやmotoなど)に接続する
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = boto3.client(
+                "sns",
+                endpoint_url=os.getenv("SNS_ENDPOINT_URL"),
+                config=Config(
+                    max_pool_connections=int(os.getenv("SNS_MAX_POOL_CONNECTIONS", "10"))
+                ),
+            )
+    return _client
+
+
+class SnsPublisher:
+    """イベントループを止めずにSNSへPublishする(バッチモードではPublishBatchでまとめて送信)"""
+
+    # PublishBatchで一度に送れる最大件数
+    MAX_BATCH_SIZE = 10
+
+    def __init__(self, topic_arn, client=None, batch=False, flush_interval=1.0):
+        self.topic_arn = topic_arn
+        self.client = client or sns_client()
+        self.batch = batch
+        self.flush_interval = flush_interval
+        # close()でまだ報告していない、送信できなかったメッセージ
+        self.failed = []
+        self._buffer = []
+        self._timer = None
+
+    async def publish(self, text):
+        """メッセージを送信(バッチモードでは送信待ちに積む)"""
+        if not self.batch:
+            await asyncio.to_thread(
+                self.client.publish, TopicArn=self.topic_arn, Message=text
+            )
+            return
+
+        self._buffer.append(text)
+        if len(self._buffer) >= self.MAX_BATCH_SIZE:
+            await self.flush()
+        elif self._timer is None:
+            # 一定時間たまったら件数に満たなくても送信する
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        # タイマーのタスクは誰もawaitしないため、例外はここで記録する
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("SNSへのバッチ送信に失敗しました")
+
+    async def flush(self):
+        """送信待ちのメッセージを10件ずつまとめて送信し、今回送信できなかったものを返す"""
+        failed = []
+        while self._buffer:
+            messages = self._buffer[:self.MAX_BATCH_SIZE]
+            del self._buffer[:self.MAX_BATCH_SIZE]
+            try:
+                response = await asyncio.to_thread(
+                    self.client.publish_batch,
+                    TopicArn=self.topic_arn,
+                    PublishBatchRequestEntries=[
+                        {"Id": str(i), "Message": message}
+                        for i, message in enumerate(messages)
+                    ],
+                )
+            except Exception as e:
+                # 呼び出し自体が失敗した場合は、取り出したメッセージをすべて失敗として残す
+                failed.extend(
+                    (message, {"Code": type(e).__name__, "Message": str(e)})
+                    for message in messages
+                )
+                continue
+            for failure in response.get("Failed", []):
+                failed.append((messages[int(failure["Id"])], failure))
+        # タイマーでの送信分も含め、close()でまとめて報告する
+        self.failed.extend(failed)
+        return failed
+
+    async def close(self):
+        """タイマーを止めて残りを送信し、送信できなかったメッセージを報告する"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        # 報告した分は破棄し、長時間動かしても溜まり続けないようにする
+        failed, self.failed = self.failed, []
+        for message, failure in failed:
+            logger.warning(
+                "SNSに送信できなかったメッセージ: %s (%s: %s)",
+                message, failure.get("Code"), failure.get("Message")
+            )
+        return failed
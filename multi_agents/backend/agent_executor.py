@@ -1,12 +1,52 @@
+import os
+import time
+from .metrics import StageTimer
 from .stream_handler import send_event
 
 
+#サブエージェントの回答の上限文字数(0は無制限)
+MAX_CHARS = int(os.getenv("SUB_AGENT_MAX_CHARS", "0"))
+#キャッシュした回答を再送する際のチャンク文字数
+REPLAY_CHUNK = int(os.getenv("REPLAY_CHUNK_CHARS", "64"))
+
+
+#回答テキストをチャンクのリストで蓄積
+class TextAccumulator:
+    def __init__(self, max_chars=MAX_CHARS):
+        self.max_chars = max_chars
+        self.chunks = []
+        self.size = 0
+        self.truncated = False
+
+    def append(self, text):
+        """チャンクを追加(上限を超えた分は破棄)"""
+        if self.max_chars:
+            room = self.max_chars - self.size
+            if room <= 0:
+                self.truncated = True
+                return
+            if len(text) > room:
+                text = text[:room]
+                self.truncated = True
+        self.chunks.append(text)
+        self.size += len(text)
+
+    def getvalue(self):
+        """蓄積したテキストを1回だけ連結して取得"""
+        text = "".join(self.chunks)
+        #以降の追加に備え、連結結果を1チャンクとして保持し直す
+        self.chunks = [text] if text else []
+        if self.truncated:
+            text += "\n(上限を超えたため、以降の回答は省略されました)"
+        return text
+
+
 async def extract(queue, agent, event, state):
     """ストリーミングから内容を抽出"""
     if isinstance(event, str):
-        state["text"] += event
+        state["text"].append(event)
         if queue:
-            delta = {"delta": {"text": event}}
+            delta = {"delta": {"text": event}, "agent": agent}
             await queue.put(
                 {"event": {"contentBlockDelta": delta}}
             )
@@ -22,36 +62,118 @@ async def extract(queue, agent, event, state):
                 tool = tool_use.get("name", "unknown")
                 await send_event(
                     queue, f"「{agent}」がツール「{tool}」を実行中",
-                    "tool_use", tool
+                    "tool_use", tool, agent
                 )
         #テキスト増分を処理
         if "contentBlockDelta" in event_data:
             block = event_data["contentBlockDelta"]
             delta = block.get("delta", {})
             if "text" in delta:
-                state["text"] += delta["text"]
-        
+                state["text"].append(delta["text"])
+            #並列実行時にどのサブエージェントのテキストか判別できるように付与
+            tagged = {**block, "agent": agent}
+            event = {
+                **event,
+                "event": {**event_data, "contentBlockDelta": tagged}
+            }
+
         if queue:
             await queue.put(event)
+    elif isinstance(event, dict) and "message" in event:
+        _track_tools(event["message"], state["timer"])
+
+
+def _track_tools(message, timer):
+    """ツールの要求から結果までの時間を計測"""
+    for content in message.get("content", []):
+        if "toolUse" in content:
+            tool_use = content["toolUse"]
+            timer.tool_started(tool_use["toolUseId"], tool_use["name"])
+        elif "toolResult" in content:
+            timer.tool_finished(content["toolResult"]["toolUseId"])
+
+
+def _is_delta(event):
+    """モデルの出力の増分か判定"""
+    if isinstance(event, str):
+        return True
+    event_data = event.get("event") if isinstance(event, dict) else None
+    return isinstance(event_data, dict) and "contentBlockDelta" in event_data
+
 
+async def replay(agent, answer, queue, timer):
+    """キャッシュ済みの回答をストリームとして再送"""
+    await send_event(
+        queue, f"「{agent}」がキャッシュ済みの回答を返します", "cache_hit",
+        agent=agent
+    )
+    timer.mark("start_latency_ms")
+    if queue:
+        for i in range(0, len(answer), REPLAY_CHUNK):
+            delta = {"delta": {"text": answer[i:i + REPLAY_CHUNK]}, "agent": agent}
+            await queue.put(
+                {"event": {"contentBlockDelta": delta}}
+            )
+    await send_event(
+        queue, f"「{agent}」が対応を完了しました", "complete",
+        agent=agent
+    )
+    timer.mark("total_ms")
+    if queue:
+        await queue.put(timer.event(cache_hit=True))
+    return answer
 
-async def invoke(agent, query, mcp, create_agent, queue):
+
+async def invoke(
+    agent, query, pool, create_agent, queue, cache=None, parent_timer=None
+):
     """サブエージェントを呼び出し"""
-    state = {"text": ""}
+    started = time.perf_counter()
+    try:
+        return await _invoke(agent, query, pool, create_agent, queue, cache)
+    finally:
+        #監督者の計測にも、ツールとしてのサブエージェントの所要時間を記録
+        if parent_timer:
+            parent_timer.add_tool(agent, started)
+
+
+async def _invoke(agent, query, pool, create_agent, queue, cache):
+    state = {"text": TextAccumulator(), "timer": StageTimer(agent)}
+    timer = state["timer"]
     await send_event(
-        queue, f"サブエージェント「{agent}」が呼び出されました", "start"
+        queue, f"サブエージェント「{agent}」が呼び出されました", "start",
+        agent=agent
     )
 
+    #キャッシュにあれば、サブエージェントを動かさずに回答
+    if cache:
+        lookup_started = time.perf_counter()
+        answer = await cache.aget(query)
+        timer.mark("cache_lookup_ms", lookup_started)
+        if answer is not None:
+            return await replay(agent, answer, queue, timer)
+
     try:
-        #MCPクライアントを起動しながら、エージェントを呼び出し
-        with mcp:
-            agent_obj = create_agent()
+        #プールからMCPセッションを借りて、エージェントを呼び出し
+        connect_started = time.perf_counter()
+        async with pool.acquire() as mcp:
+            timer.mark("mcp_connect_ms", connect_started)
+            agent_obj = await create_agent(mcp)
             async for event in agent_obj.stream_async(query):
+                #初期化イベントではなく、モデルの最初の出力までの時間を計測
+                if "start_latency_ms" not in timer.stages and _is_delta(event):
+                    timer.mark("start_latency_ms")
                 await extract(queue, agent, event, state)
         await send_event(
-            queue, f"「{agent}」が対応を完了しました", "complete"
+            queue, f"「{agent}」が対応を完了しました", "complete",
+            agent=agent
         )
-        return state["text"]
+        timer.mark("total_ms")
+        if queue:
+            await queue.put(timer.event(cache_hit=False))
+        answer = state["text"].getvalue()
+        if cache:
+            await cache.aput(query, answer)
+        return answer
     except Exception:
         return f"{agent}エージェントの処理に失敗しました"
-    
\ No newline at end of file
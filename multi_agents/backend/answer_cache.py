@@ -0,0 +1,42 @@
+import asyncio
+import os
+import tempfile
+from .ttl_cache import TtlCache, normalize_query
+
+
+#サブエージェントの回答キャッシュ
+class AnswerCache(TtlCache):
+    def __init__(
+        self, path=None, ttl=None, max_entries=None, max_disk_entries=None
+    ):
+        super().__init__(
+            path or os.getenv("ANSWER_CACHE_PATH") or os.path.join(
+                tempfile.gettempdir(), "answer_cache.db"
+            ),
+            "answers",
+            ttl or float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            max_entries or int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+            max_disk_entries or int(
+                os.getenv("ANSWER_CACHE_DISK_SIZE", "10000")
+            ),
+        )
+
+    def _keys(self, query):
+        """完全一致キーと正規化キー"""
+        return f"exact:{query}", f"norm:{normalize_query(query)}"
+
+    def get(self, query):
+        """キャッシュ済みの回答を取得(なければNone)"""
+        return self.lookup(self._keys(query))
+
+    def put(self, query, answer):
+        """回答を保存"""
+        self.store(self._keys(query), answer)
+
+    async def aget(self, query):
+        """getの非同期版(SQLiteの読み書きでイベントループを止めないよう別スレッドで実行)"""
+        return await asyncio.to_thread(self.get, query)
+
+    async def aput(self, query, answer):
+        """putの非同期版(書き込みとcommitは別スレッドで実行)"""
+        await asyncio.to_thread(self.put, query, answer)
@@ -1,51 +1,50 @@
 import os
-from strands import Agent, tool
+from strands import tool
 from strands.tools.mcp import MCPClient
 from mcp import stdio_client, StdioServerParameters
 from .agent_executor import invoke
+from .mcp_pool import McpSessionPool
+from .tool_cache import SubAgentTemplate
+from .session import current_queue, current_timer
 
 
 #エージェントの状態を管理
 class ApiMasterState:
     def __init__(self):
-        self.client = None
-        self.queue = None
+        self.pool = None
+        self.template = None
 
 _state = ApiMasterState()
 
 
-def setup_api_master(queue):
-    """新規キューを受け取り、MCPクライアントを準備"""
-    _state.queue = queue
-    if queue and not _state.client:
-        try:
-            _state.client = MCPClient(
-                lambda: stdio_client(StdioServerParameters(
-                    command="uvx",
-                    args=["awslabs.aws-api-mcp-server"],
-                    env=os.environ.copy()
-                ))
-            )
-        except Exception:
-            _state.client = None
-
-
-def _create_agent():
-    """サブエージェントを作成"""
-    if not _state.client:
-        return None
-    return Agent(
-        model="us.amazon.nova-premier-v1:0",
-        tools=_state.client.list_tools_sync()
+def setup_api_master():
+    """MCPセッションのプールとサブエージェントのひな形を準備"""
+    if not _state.pool:
+        #起動済みのセッションを呼び出し間で使い回す
+        _state.pool = McpSessionPool(lambda: MCPClient(
+            lambda: stdio_client(StdioServerParameters(
+                command="uvx",
+                args=["awslabs.aws-api-mcp-server"],
+                env=os.environ.copy()
+            ))
+        ))
+    if not _state.template:
+        #ツール定義をキャッシュしたひな形からサブエージェントを作成
+        _state.template = SubAgentTemplate("us.amazon.nova-premier-v1:0")
+
+
+async def ask_api_master(query):
+    """APIマスターへ問い合わせ"""
+    if not _state.pool:
+        return "MCPクライアントが利用不可です"
+    return await invoke(
+        "APIマスター", query, _state.pool,
+        _state.template.create, current_queue(),
+        parent_timer=current_timer()
     )
 
 
 @tool
 async def api_master(query):
     """APIマスターエージェント"""
-    if not _state.client:
-        return "MCPクライアントが利用不可です"
-    return await invoke(
-        "APIマスター", query, _state.client,
-        _create_agent, _state.queue
-    )
+    return await ask_api_master(query)
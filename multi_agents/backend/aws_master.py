@@ -1,46 +1,51 @@
-from strands import Agent, tool
+from strands import tool
 from strands.tools.mcp import MCPClient
 from mcp.client.streamable_http import streamablehttp_client
 from .agent_executor import invoke
+from .answer_cache import AnswerCache
+from .mcp_pool import McpSessionPool
+from .tool_cache import SubAgentTemplate
+from .session import current_queue, current_timer
 
 
 #エージェントの状態を管理
 class AwsMasterState:
     def __init__(self):
-        self.client = None
-        self.queue = None
+        self.pool = None
+        self.template = None
+        self.cache = None
 
 _state = AwsMasterState()
 
-def setup_aws_master(queue):
-    _state.queue = queue
-    if queue and not _state.client:
-        try:
-            _state.client = MCPClient(
-                lambda: streamablehttp_client(
-                    "https://knowledge-mcp.global.api.aws"
-                )
+def setup_aws_master():
+    """MCPセッションのプール、サブエージェントのひな形、回答キャッシュを準備"""
+    if not _state.pool:
+        #起動済みのセッションを呼び出し間で使い回す
+        _state.pool = McpSessionPool(lambda: MCPClient(
+            lambda: streamablehttp_client(
+                "https://knowledge-mcp.global.api.aws"
             )
-        except Exception:
-            _state.client = None
-
-
-def _create_agent():
-    """サブエージェントを作成"""
-    if not _state.client:
-        return None
-    return Agent(
-        model="us.amazon.nova-premier-v1:0",
-        tools=_state.client.list_tools_sync()
+        ))
+    if not _state.template:
+        #ツール定義をキャッシュしたひな形からサブエージェントを作成
+        _state.template = SubAgentTemplate("us.amazon.nova-premier-v1:0")
+    if not _state.cache:
+        #同じ質問はドキュメントを引き直さずに回答
+        _state.cache = AnswerCache()
+
+
+async def ask_aws_master(query):
+    """AWSマスターへ問い合わせ"""
+    if not _state.pool:
+        return "MCPクライアントが利用不可です"
+    return await invoke(
+        "AWSマスター", query, _state.pool,
+        _state.template.create, current_queue(), _state.cache,
+        parent_timer=current_timer()
     )
 
 
 @tool
 async def aws_master(query):
     """AWSマスターエージェント"""
-    if not _state.client:
-        return "MCPクライアントが利用不可です"
-    return await invoke(
-        "AWSマスター", query, _state.client,
-        _create_agent, _state.queue
-    )
+    return await ask_aws_master(query)
@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+from mcp.server.fastmcp import FastMCP
+
+
+def create_server(name, tool_name, latency_ms, port):
+    """固定の応答を返すMCPサーバを作成"""
+    server = FastMCP(name, host="127.0.0.1", port=port)
+
+    async def fake_tool(query: str) -> str:
+        """ベンチマーク用のダミーツール"""
+        await asyncio.sleep(latency_ms / 1000)
+        return f"{query}についてのダミー応答です"
+
+    server.add_tool(fake_tool, name=tool_name)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        server = create_server(
+            "fake-aws-api", "call_aws", args.latency_ms, args.port
+        )
+        server.run()
+    else:
+        server = create_server(
+            "fake-aws-knowledge", "search_documentation",
+            args.latency_ms, args.port
+        )
+        server.run(transport="streamable-http")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import uuid
+from strands.models.model import Model
+
+
+#Bedrock Converseのストリームを模したモデル
+class FakeConverseModel(Model):
+    def __init__(
+        self, tokens_per_sec=50.0, first_token_ms=300.0,
+        answer_tokens=100, tool_names=None, use_tools=True
+    ):
+        self.config = {
+            "tokens_per_sec": tokens_per_sec,
+            "first_token_ms": first_token_ms,
+            "answer_tokens": answer_tokens,
+            "tool_names": tool_names,
+            "use_tools": use_tools
+        }
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(
+        self, output_model, prompt, system_prompt=None, **kwargs
+    ):
+        """検証を省いた空の出力モデルを返す(負荷試験の経路では使われない)"""
+        await asyncio.sleep(self.config["first_token_ms"] / 1000)
+        yield {"output": output_model.model_construct()}
+
+    def _pick_tools(self, tool_specs):
+        """呼び出すツールを選択"""
+        if not tool_specs or not self.config["use_tools"]:
+            return []
+        names = self.config["tool_names"]
+        if names is None:
+            return tool_specs[:1]
+        return [spec for spec in tool_specs if spec["name"] in names]
+
+    async def stream(
+        self, messages, tool_specs=None, system_prompt=None, **kwargs
+    ):
+        """1ターン目はツールを呼び、ツール結果を受け取ったら回答"""
+        await asyncio.sleep(self.config["first_token_ms"] / 1000)
+        yield {"messageStart": {"role": "assistant"}}
+
+        last = messages[-1]["content"] if messages else []
+        answered_tools = any("toolResult" in block for block in last)
+        tools = [] if answered_tools else self._pick_tools(tool_specs)
+
+        if tools:
+            for spec in tools:
+                async for event in self._tool_use(spec):
+                    yield event
+            stop_reason = "tool_use"
+        else:
+            async for event in self._text():
+                yield event
+            stop_reason = "end_turn"
+
+        yield {"messageStop": {"stopReason": stop_reason}}
+        yield {"metadata": {
+            "usage": {
+                "inputTokens": 0,
+                "outputTokens": self.config["answer_tokens"],
+                "totalTokens": self.config["answer_tokens"]
+            },
+            "metrics": {"latencyMs": 0}
+        }}
+
+    async def _text(self):
+        """設定したトークンレートで回答を送信"""
+        interval = 1 / self.config["tokens_per_sec"]
+        yield {"contentBlockStart": {"start": {}}}
+        for i in range(self.config["answer_tokens"]):
+            if i:
+                await asyncio.sleep(interval)
+            yield {"contentBlockDelta": {"delta": {"text": "トークン"}}}
+        yield {"contentBlockStop": {}}
+
+    async def _tool_use(self, spec):
+        """必須パラメータを埋めてツールを呼び出す"""
+        schema = spec.get("inputSchema", {}).get("json", {})
+        tool_input = {
+            name: "benchmark" for name in schema.get("required", [])
+        }
+        tool_use = {"toolUseId": str(uuid.uuid4()), "name": spec["name"]}
+        yield {"contentBlockStart": {"start": {"toolUse": tool_use}}}
+        yield {"contentBlockDelta": {
+            "delta": {"toolUse": {"input": json.dumps(tool_input)}}
+        }}
+        yield {"contentBlockStop": {}}
@@ -0,0 +1,206 @@
+"""AgentCoreのエントリーポイントをローカルの代替サーバで負荷試験する
+
+リポジトリのルートで実行:
+    python -m multi_agents.backend.benchmark.load_test --concurrency 1,10,100
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from mcp import stdio_client, StdioServerParameters
+from mcp.client.streamable_http import streamablehttp_client
+from strands.tools.mcp import MCPClient
+from .. import main, aws_master, api_master
+from ..mcp_pool import McpSessionPool
+from ..tool_cache import SubAgentTemplate
+from .fake_model import FakeConverseModel
+
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_mcp_server.py")
+
+
+def _free_port():
+    """空いているポートを取得"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=30.0):
+    """HTTPサーバの起動を待機"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError):
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"ポート{port}のサーバが起動しませんでした")
+
+
+def _start_http_server(args):
+    """HTTP版のダミーMCPサーバを起動"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, FAKE_SERVER, "--transport", "http",
+            "--port", str(port), "--latency-ms", str(args.tool_latency_ms)
+        ],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _wait_for_port(port)
+    return process, f"http://127.0.0.1:{port}/mcp"
+
+
+def _fake_model(args, **kwargs):
+    return FakeConverseModel(
+        tokens_per_sec=args.token_rate,
+        first_token_ms=args.first_token_ms,
+        answer_tokens=args.answer_tokens,
+        **kwargs
+    )
+
+
+def configure(args, http_url):
+    """本番のMCPサーバとBedrockを代替サーバに差し替え"""
+    main._model = _fake_model(args, tool_names=["aws_master", "api_master"])
+
+    aws_master._state.pool = McpSessionPool(
+        lambda: MCPClient(lambda: streamablehttp_client(http_url)),
+        size=args.pool_size
+    )
+    api_master._state.pool = McpSessionPool(
+        lambda: MCPClient(lambda: stdio_client(StdioServerParameters(
+            command=sys.executable,
+            args=[
+                FAKE_SERVER, "--transport", "stdio",
+                "--latency-ms", str(args.tool_latency_ms)
+            ]
+        ))),
+        size=args.pool_size
+    )
+    for state in (aws_master._state, api_master._state):
+        state.template = SubAgentTemplate(_fake_model(args))
+    if not args.answer_cache:
+        aws_master._state.cache = None
+
+
+def _is_text(event):
+    """クライアントに表示されるテキスト増分か判定"""
+    if not isinstance(event, dict):
+        return False
+    block = event.get("event", {}).get("contentBlockDelta", {})
+    return "text" in block.get("delta", {})
+
+
+async def run_session(prompt):
+    """1セッション分の呼び出しを計測"""
+    start = time.perf_counter()
+    first_token = None
+    events = 0
+    async for event in main.invoke({"input": {"prompt": prompt}}):
+        events += 1
+        if first_token is None and _is_text(event):
+            first_token = time.perf_counter() - start
+    return {
+        "latency": time.perf_counter() - start,
+        "ttft": first_token,
+        "events": events
+    }
+
+
+def percentile(values, p):
+    """最近傍法でパーセンタイルを算出"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(concurrency, prompt):
+    """指定した同時実行数で計測"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_session(prompt) for _ in range(concurrency))
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = [r["latency"] for r in results]
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None]
+    events = sum(r["events"] for r in results)
+    return {
+        "concurrency": concurrency,
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "events_per_sec": events / elapsed,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "memory_per_session_kb": peak / concurrency / 1024
+    }
+
+
+def print_table(rows):
+    """結果を表形式で出力"""
+    columns = [
+        "concurrency", "ttft_p50", "ttft_p95", "events_per_sec", "latency_p50",
+        "latency_p95", "latency_p99", "memory_per_session_kb"
+    ]
+    print(" | ".join(f"{c:>21}" for c in columns))
+    for row in rows:
+        print(" | ".join(
+            f"{row[c]:>21}" if isinstance(row[c], int) else f"{row[c]:>21.3f}"
+            for c in columns
+        ))
+
+
+async def run(args):
+    rows = []
+    for concurrency in args.concurrency:
+        #Strandsの標準コールバックによるトークン出力は計測対象外
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows.append(await run_level(concurrency, args.prompt))
+    await aws_master._state.pool.close()
+    await api_master._state.pool.close()
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--concurrency", default="1,10,100",
+        type=lambda v: [int(c) for c in v.split(",")]
+    )
+    parser.add_argument("--prompt", default="Bedrockの利用可能なモデルを調べて")
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--answer-tokens", type=int, default=100)
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server, http_url = _start_http_server(args)
+    try:
+        configure(args, http_url)
+        rows = asyncio.run(run(args))
+    finally:
+        server.terminate()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
@@ -1,24 +1,40 @@
-import asyncio
+import os
 from strands import Agent
+from strands.models import BedrockModel
+from strands.tools.executors import ConcurrentToolExecutor, SequentialToolExecutor
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 from .aws_master import aws_master, setup_aws_master
 from .api_master import api_master, setup_api_master
-from .stream_handler import merge_streams
+from .metrics import StageTimer
+from .session import open_session, close_session
+from .stream_handler import create_queue, is_text, merge_streams
+
+
+#同じターンで要求されたサブエージェントを並列に呼び出すか(falseで1件ずつ順に実行)
+PARALLEL = os.getenv("ORCHESTRATOR_PARALLEL", "true").lower() == "true"
+
+SYSTEM_PROMPT = """2体のサブエージェントを使って日本語で応対して。
+        1. AWSマスター: AWSドキュメントなどを参照できます。
+        2. APIマスター: AWSアカウントをAPIで操作できます。
+        """
+
+
+#モデルは呼び出し間で共有
+_model = BedrockModel(model_id="us.amazon.nova-premier-v1:0")
 
 
 def _create_orchestrator():
     """監督者エージェントを作成"""
     return Agent(
-        model="us.amazon.nova-premier-v1:0",
+        model=_model,
         tools=[aws_master, api_master],
-        system_prompt="""2体のサブエージェントを使って日本語で応対して。
-        1. AWSマスター: AWSドキュメントなどを参照できます。
-        2. APIマスター: AWSアカウントをAPIで操作できます。
-        """
+        system_prompt=SYSTEM_PROMPT,
+        tool_executor=ConcurrentToolExecutor() if PARALLEL else SequentialToolExecutor()
     )
 
 app = BedrockAgentCoreApp()
-orchestrator = _create_orchestrator()
+setup_aws_master()
+setup_api_master()
 
 
 @app.entrypoint
@@ -26,21 +42,33 @@ async def invoke(payload):
     """呼び出し処理の開始時点"""
     prompt = payload.get("input", {}).get("prompt", "")
 
-    #サブエージェントのキューを初期化
-    queue = asyncio.Queue()
-    setup_aws_master(queue)
-    setup_api_master(queue)
+    timer = StageTimer("orchestrator")
+
+    #呼び出し単位のキューをセッションに紐付け
+    queue = create_queue()
+    #サブエージェントごとの所要時間も監督者の計測に記録する
+    token = open_session(queue, timer)
 
     try:
+        #会話履歴が混ざらないよう、監督者エージェントは呼び出しごとに作成
+        orchestrator = _create_orchestrator()
         #監督者エージェントを呼び出し、ストリームを統合
         stream = orchestrator.stream_async(prompt)
         async for event in merge_streams(stream, queue):
+            if "ttft_ms" not in timer.stages and is_text(event):
+                timer.mark("ttft_ms")
             yield event
-    
+
+        #ステージごとの所要時間を最後に送信
+        timer.mark("total_ms")
+        average, longest = queue.wait_stats()
+        timer.set("queue_wait_avg_ms", average)
+        timer.set("queue_wait_max_ms", longest)
+        yield timer.event()
+
     finally:
-        #キューをクリーンアップ
-        setup_aws_master(None)
-        setup_api_master(None)
+        #セッションをクリーンアップ
+        close_session(token)
 
 
 #APIサーバを起動
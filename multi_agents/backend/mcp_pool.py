@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+
+#起動済みのMCPセッションを使い回すプール
+class McpSessionPool:
+    def __init__(
+        self, create_client, size=None,
+        idle_timeout=None, check_interval=None, retries=1
+    ):
+        self.create_client = create_client
+        self.size = size or int(os.getenv("MCP_POOL_SIZE", "4"))
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+        if check_interval is None:
+            check_interval = float(os.getenv("MCP_POOL_CHECK_INTERVAL", "30"))
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.retries = retries
+        #(クライアント, 最終利用時刻)を古い順に保持
+        self._idle = []
+        self._slots = asyncio.Semaphore(self.size)
+
+    async def _start(self):
+        """新しいセッションを起動(失敗時は再接続)"""
+        for attempt in range(self.retries + 1):
+            client = self.create_client()
+            try:
+                #起動処理はブロッキングのため、イベントループ外で実行
+                await asyncio.to_thread(client.start)
+                return client
+            except Exception:
+                await self._stop(client)
+                if attempt == self.retries:
+                    raise
+
+    async def _stop(self, client):
+        """セッションを停止"""
+        try:
+            await asyncio.to_thread(client.__exit__, None, None, None)
+        except Exception:
+            pass
+
+    async def _is_healthy(self, client, last_used):
+        """一定時間使われていないセッションのみ疎通確認"""
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            await asyncio.to_thread(client.list_tools_sync)
+            return True
+        except Exception:
+            return False
+
+    async def _evict_idle(self):
+        """アイドル時間を超えたセッションを停止"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            client, _ = self._idle.pop(0)
+            await self._stop(client)
+
+    async def _checkout(self):
+        """利用可能なセッションを取り出す"""
+        await self._evict_idle()
+        while self._idle:
+            #直近に使ったセッションから優先して再利用
+            client, last_used = self._idle.pop()
+            if await self._is_healthy(client, last_used):
+                return client
+            await self._stop(client)
+        return await self._start()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """セッションを借り出し、終了後にプールへ戻す"""
+        async with self._slots:
+            client = await self._checkout()
+            try:
+                yield client
+            except BaseException:
+                #失敗したセッションは破棄し、次回は再接続
+                await self._stop(client)
+                raise
+            self._idle.append((client, time.monotonic()))
+
+    async def close(self):
+        """プール内の全セッションを停止"""
+        while self._idle:
+            client, _ = self._idle.pop()
+            await self._stop(client)
@@ -0,0 +1,73 @@
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+#メトリクスをログに出力する送信先
+class LoggingSink:
+    def record(self, name, value, tags):
+        logger.debug("%s=%.1f %s", name, value, tags)
+
+
+_sink = LoggingSink()
+
+
+def set_metrics_sink(sink):
+    """メトリクスの送信先を差し替え(record(name, value, tags)を実装)"""
+    global _sink
+    _sink = sink
+
+
+def record(name, value, **tags):
+    """メトリクスを送信"""
+    try:
+        _sink.record(name, value, tags)
+    except Exception:
+        #計測の失敗で本処理を止めない
+        logger.exception("メトリクスの送信に失敗しました")
+
+
+#エージェント単位でステージごとの所要時間を計測
+class StageTimer:
+    def __init__(self, agent):
+        self.agent = agent
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tools = []
+        self._running_tools = {}
+
+    def mark(self, name, since=None):
+        """開始時点(省略時は計測開始)からの経過時間を記録"""
+        elapsed = (time.perf_counter() - (since or self.started)) * 1000
+        self.stages[name] = round(elapsed, 1)
+        record(name, elapsed, agent=self.agent)
+
+    def set(self, name, value):
+        """計測済みの値を記録"""
+        self.stages[name] = round(value, 1)
+        record(name, value, agent=self.agent)
+
+    def tool_started(self, tool_use_id, name):
+        """ツール実行の開始"""
+        self._running_tools[tool_use_id] = (name, time.perf_counter())
+
+    def tool_finished(self, tool_use_id):
+        """ツール実行の終了"""
+        if tool_use_id not in self._running_tools:
+            return
+        self.add_tool(*self._running_tools.pop(tool_use_id))
+
+    def add_tool(self, name, started):
+        """開始時点からのツールの所要時間を記録"""
+        elapsed = (time.perf_counter() - started) * 1000
+        self.tools.append({"name": name, "ms": round(elapsed, 1)})
+        record("tool_execution_ms", elapsed, agent=self.agent, tool=name)
+
+    def event(self, **labels):
+        """ストリームに流す計測結果のイベント"""
+        timing = {"agent": self.agent, **labels, **self.stages}
+        if self.tools:
+            timing["tools"] = self.tools
+        return {"event": {"subAgentTiming": timing}}
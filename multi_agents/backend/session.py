@@ -0,0 +1,41 @@
+import contextvars
+
+
+#呼び出し単位のセッションを管理
+class Session:
+    def __init__(self, queue, timer=None):
+        self.queue = queue
+        self.timer = timer
+
+_current = contextvars.ContextVar("session", default=None)
+
+
+def open_session(queue, timer=None):
+    """呼び出し単位のセッションを開始"""
+    return _current.set(Session(queue, timer))
+
+
+def close_session(token):
+    """セッションを終了"""
+    try:
+        _current.reset(token)
+    except ValueError:
+        #別コンテキストで終了処理された場合は、そのコンテキストごと破棄される
+        pass
+
+
+def current_session():
+    """実行中の呼び出しのセッションを取得"""
+    return _current.get()
+
+
+def current_queue():
+    """実行中の呼び出しのキューを取得"""
+    session = _current.get()
+    return session.queue if session else None
+
+
+def current_timer():
+    """実行中の呼び出しの監督者の計測を取得"""
+    session = _current.get()
+    return session.timer if session else None
@@ -1,7 +1,63 @@
 import asyncio
+import collections
+import os
+import time
 
 
-async def send_event(queue, message, stage, tool_name=None):
+#キューの上限とテキスト増分の結合条件
+QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "0"))
+COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "512"))
+
+#メインエージェントのストリーム終端
+_END = object()
+
+
+#キューでの待ち時間を計測するキュー
+class TimedQueue(asyncio.Queue):
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._stamps = collections.deque()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _put(self, item):
+        super()._put(item)
+        self._stamps.append(time.perf_counter())
+
+    def _get(self):
+        wait = time.perf_counter() - self._stamps.popleft()
+        self.wait_count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        return super()._get()
+
+    def wait_stats(self):
+        """待ち時間の平均と最大(ミリ秒)"""
+        average = self.wait_total / self.wait_count if self.wait_count else 0.0
+        return average * 1000, self.wait_max * 1000
+
+
+def create_queue():
+    """上限付きのキューを作成(満杯時は送信側を待たせる)"""
+    return TimedQueue(maxsize=QUEUE_SIZE)
+
+
+def is_text(event):
+    """クライアントに表示されるテキストを含むイベントか判定"""
+    if not isinstance(event, dict):
+        return False
+    if "data" in event:
+        return True
+    event_data = event.get("event")
+    if not isinstance(event_data, dict):
+        return False
+    block = event_data.get("contentBlockDelta", {})
+    return "text" in block.get("delta", {})
+
+
+async def send_event(queue, message, stage, tool_name=None, agent=None):
     """サブエージェントのステータスを送信"""
     if not queue:
         return
@@ -9,42 +65,114 @@ async def send_event(queue, message, stage, tool_name=None):
     event = {"event": {"subAgentProgress": progress}}
     if tool_name:
         progress["tool_name"] = tool_name
+    if agent:
+        #並列実行時にどのサブエージェントの進捗か判別できるように付与
+        progress["agent"] = agent
     await queue.put(event)
 
 
-async def merge_streams(stream, queue):
-    """親子エージェントのストリームを統合"""
-    create_task = asyncio.create_task
-    main = create_task(anext(stream, None))
-    sub = create_task(queue.get())
-    waiting = {main, sub}
-
-    #チャンクの到着を待機
-    while waiting:
-        ready_chunks, waiting = await asyncio.wait(
-            waiting, return_when=asyncio.FIRST_COMPLETED
-        )
-
-        for ready_chunk in ready_chunks:
-            #メインエージェントのチャンクを処理
-            if ready_chunk == main:
-                event = ready_chunk.result()
-                if event is not None:
-                    yield event
-                    main = create_task(anext(stream, None))
-                    waiting.add(main)
-                else:
-                    main = None
-            
-            #サブエージェントのチャンクを処理
-            elif ready_chunk == sub:
-                try:
-                    sub_event = ready_chunk.result()
-                    yield sub_event
-                    sub = create_task(queue.get())
-                    waiting.add(sub)
-                except Exception:
-                    sub = None
-        
-        if main is None and queue.empty():
+def _text_delta(event):
+    """結合可能なテキスト増分なら(ブロック, テキスト)を返す"""
+    if not isinstance(event, dict) or len(event) != 1:
+        return None
+    event_data = event.get("event")
+    if not isinstance(event_data, dict) or len(event_data) != 1:
+        return None
+    block = event_data.get("contentBlockDelta")
+    if not isinstance(block, dict):
+        return None
+    delta = block.get("delta", {})
+    if len(delta) != 1 or not isinstance(delta.get("text"), str):
+        return None
+    return block, delta["text"]
+
+
+def _source(block):
+    """テキスト増分の送信元(サブエージェント名とブロック番号)"""
+    return block.get("agent"), block.get("contentBlockIndex")
+
+
+async def _coalesce(block, text, queue, window, max_bytes):
+    """同じ送信元から続くテキスト増分を結合し、結合できなかった次の要素も返す"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + window
+    source = _source(block)
+    texts = [text]
+    size = len(text.encode())
+    leftover = None
+
+    while size < max_bytes:
+        if not queue.empty():
+            item = queue.get_nowait()
+        else:
+            #到着済みのものがなければ、結合ウィンドウ内だけ待つ
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                async with asyncio.timeout(remaining):
+                    item = await queue.get()
+            except TimeoutError:
+                break
+
+        #送信元が変わったら結合しない(並列実行中の別エージェントのテキストを混ぜない)
+        found = _text_delta(item)
+        if not found or _source(found[0]) != source:
+            leftover = item
             break
+        texts.append(found[1])
+        size += len(found[1].encode())
+
+    merged = {**block, "delta": {"text": "".join(texts)}}
+    return {"event": {"contentBlockDelta": merged}}, leftover
+
+
+def _is_callback_delta(event):
+    """生のcontentBlockDeltaの直後に届く、同じ増分を持つコールバック用のイベントか判定"""
+    return isinstance(event, dict) and "delta" in event and "event" not in event
+
+
+async def _pump(stream, queue):
+    """メインエージェントのストリームをキューへ転送"""
+    try:
+        async for event in stream:
+            #重複するコールバック用のイベントを挟むとテキスト増分が隣接せず結合できないため送らない
+            if _is_callback_delta(event):
+                continue
+            await queue.put(event)
+    except Exception:
+        await queue.put(_END)
+        raise
+    await queue.put(_END)
+
+
+async def merge_streams(
+    stream, queue, window_ms=COALESCE_MS, max_bytes=COALESCE_BYTES
+):
+    """親子エージェントのストリームを統合"""
+    #メインのストリームも同じキューに流し、チャンクごとのタスク生成を避ける
+    pump = asyncio.create_task(_pump(stream, queue))
+    pending = None
+
+    try:
+        while True:
+            if pending is not None:
+                event, pending = pending, None
+            else:
+                event = await queue.get()
+
+            #メインエージェントの終了(例外があれば再送出)
+            if event is _END:
+                await pump
+                break
+
+            #テキスト増分は隣接するものをまとめて送信
+            found = _text_delta(event)
+            if found and max_bytes > 0:
+                event, pending = await _coalesce(
+                    found[0], found[1], queue, window_ms / 1000, max_bytes
+                )
+            yield event
+    finally:
+        if not pump.done():
+            pump.cancel()
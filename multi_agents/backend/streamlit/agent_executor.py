@@ -1,5 +1,6 @@
-import os, json, uuid
+import os, json, uuid, asyncio
 import streamlit as st
+from sse import iter_events
 from stream_handler import(
     create_state, think, change_status, stream, finish
 )
@@ -28,7 +29,9 @@ async def invoke(prompt, container, agent_core):
     think(container, state)
 
     try:
-        agent_response = agent_core.invoke_agent_runtime(
+        #呼び出し自体もブロッキングのため、イベントループ外で実行
+        agent_response = await asyncio.to_thread(
+            agent_core.invoke_agent_runtime,
             agentRuntimeArn=os.getenv("AGENT_RUNTIME_ARN"),
             runtimeSessionId=session_id,
             payload=json.dumps({
@@ -39,16 +42,14 @@ async def invoke(prompt, container, agent_core):
             qualifier="DEFAULT"
         )
 
-        for line in agent_response["response"].iter_lines():
-            decoded = line.decode("utf-8")
-            if not line or not decoded.startswith("data: "):
-                continue
+        async for decoded in iter_events(agent_response["response"]):
             try:
-                data = json.loads(decoded[6:])
+                data = json.loads(decoded)
                 extract(data, container, state)
             except json.JSONDecodeError:
                 continue
+        finish(state)
+        return state["final_response"]
     except Exception as e:
         st.error(f"エラーが発生しました: {e}")
         return ""
-    
\ No newline at end of file
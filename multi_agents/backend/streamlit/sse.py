@@ -0,0 +1,72 @@
+import asyncio
+
+
+#Server-Sent Eventsの逐次パーサー
+class SseParser:
+    def __init__(self):
+        self.buffer = b""
+        self.data = []
+
+    def feed(self, chunk):
+        """受信したバイト列を解析し、確定したイベントのデータを返す"""
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split(b"\n")
+        events = []
+        for line in lines:
+            event = self._parse_line(line.rstrip(b"\r").decode("utf-8"))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self):
+        """ストリーム終端で残りのイベントを返す"""
+        events = self.feed(b"\n") if self.buffer else []
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _parse_line(self, line):
+        """1行を解析(空行でイベントを確定)"""
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if field == "data":
+            self.data.append(value[1:] if value.startswith(" ") else value)
+        return None
+
+    def _dispatch(self):
+        """溜めたdata行を1イベントとして確定"""
+        if not self.data:
+            return None
+        data = "\n".join(self.data)
+        self.data = []
+        return data
+
+
+async def iter_events(body, chunk_size=1024):
+    """レスポンスボディを別スレッドで読み、イベントを非同期に返す"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def read():
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    reader = loop.run_in_executor(None, read)
+    parser = SseParser()
+    while (chunk := await queue.get()) is not None:
+        if isinstance(chunk, Exception):
+            raise chunk
+        for data in parser.feed(chunk):
+            yield data
+    for data in parser.flush():
+        yield data
+    await reader
@@ -1,15 +1,35 @@
+import os, time
 import streamlit as st
 
 
+#1秒あたりの最大再描画回数
+RENDER_FPS = float(os.getenv("RENDER_FPS", "10"))
+
+
 def create_state():
     """新しい状態を作成"""
     return {
         "containers": [],
-        "current_status": None,
-        "current_text": None,
+        #エージェント名(監督者はNone)ごとの現在のステータスとテキスト
+        "statuses": {},
+        "texts": {},
+        "dirty": set(),
+        "last_render": 0.0,
         "final_response": ""
     }
 
+def render(state):
+    """溜めたテキストをまとめて描画"""
+    for agent in state["dirty"]:
+        text = state["texts"].get(agent)
+        if text:
+            text["placeholder"].markdown("".join(text["chunks"]))
+    state["dirty"].clear()
+    #最終的な回答は監督者のテキスト
+    if None in state["texts"]:
+        state["final_response"] = "".join(state["texts"][None]["chunks"])
+    state["last_render"] = time.monotonic()
+
 def think(container, state):
     """思考開始を表示"""
     with container:
@@ -22,9 +42,13 @@ def change_status(event, container, state):
     progress_info = event["subAgentProgress"]
     message = progress_info.get("message")
     stage = progress_info.get("stage", "processing")
+    agent = progress_info.get("agent")
 
-    if state["current_status"]:
-        status, old_message = state["current_status"]
+    #未描画のテキストを反映してから次のステータスへ
+    render(state)
+    #並列実行中の他のエージェントのステータスは完了にしない
+    if agent in state["statuses"]:
+        status, old_message = state["statuses"][agent]
         status.status(old_message, state="complete")
 
     with container:
@@ -34,34 +58,45 @@ def change_status(event, container, state):
         else:
             display_state = "running"
         new_status_box.status(message, state=display_state)
-    
+
     status_info = (new_status_box, message)
     state["containers"].append(status_info)
-    state["current_status"] = status_info
-    state["current_text"] = None
-    state["final_response"] = ""
+    state["statuses"][agent] = status_info
+    #監督者のテキストはステータスを挟んだら新しい段落として表示
+    if None in state["texts"]:
+        del state["texts"][None]
+        state["final_response"] = ""
 
 
 def stream(event, container, state):
     """テキストをストリーム表示"""
-    delta = event["contentBlockDelta"]["delta"]
+    block = event["contentBlockDelta"]
+    delta = block["delta"]
     if "text" not in delta:
         return
-    
-    if state["current_text"] is None:
+    #並列実行中のサブエージェントのテキストが混ざらないよう、エージェントごとに表示
+    agent = block.get("agent")
+
+    if agent not in state["texts"]:
         if state["containers"]:
             status, first_message = state["containers"][0]
             if "思考中" in first_message:
                 status.status("思考中", state="complete")
-        if state["current_status"]:
-            status, message = state["current_status"]
+        if agent in state["statuses"]:
+            status, message = state["statuses"][agent]
             status.status(message, state="complete")
+        with container:
+            placeholder = st.empty()
+        state["texts"][agent] = {"placeholder": placeholder, "chunks": []}
+
+    #トークンごとではなく、一定間隔でまとめて再描画
+    state["texts"][agent]["chunks"].append(delta["text"])
+    state["dirty"].add(agent)
+    if time.monotonic() - state["last_render"] >= 1 / RENDER_FPS:
+        render(state)
 
 def finish(state):
     """表示の修了処理"""
-    if state["current_text"]:
-        response = state["final_response"]
-        state["current_text"].markdown(response)
+    render(state)
     for status, message in state["containers"]:
         status.status(message, state="complete")
-        
\ No newline at end of file
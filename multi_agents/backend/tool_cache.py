@@ -0,0 +1,69 @@
+import asyncio
+import os
+import time
+from strands import Agent
+from strands.models import BedrockModel
+from strands.tools.mcp import MCPAgentTool
+from .metrics import record
+
+
+#MCPツール定義のキャッシュ
+class ToolSchemaCache:
+    def __init__(self, ttl=None):
+        if ttl is None:
+            ttl = float(os.getenv("TOOL_CACHE_TTL", "600"))
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._schemas = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_tools(self, client):
+        """キャッシュ済みの定義から、セッションに紐付いたツールを作成"""
+        async with self._lock:
+            if self._schemas is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+            else:
+                self.misses += 1
+                tools = await asyncio.to_thread(client.list_tools_sync)
+                self._schemas = [tool.mcp_tool for tool in tools]
+                self._expires_at = time.monotonic() + self.ttl
+            schemas = self._schemas
+        record("tool_cache_hit_rate", self.hit_rate)
+        return [MCPAgentTool(schema, client) for schema in schemas]
+
+    def invalidate(self):
+        """キャッシュを破棄し、次回はサーバから再取得"""
+        self._schemas = None
+        self._expires_at = 0.0
+
+    @property
+    def hit_rate(self):
+        """キャッシュのヒット率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """メトリクスを取得"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate
+        }
+
+
+#サブエージェントのひな形
+class SubAgentTemplate:
+    def __init__(self, model, cache=None, **agent_kwargs):
+        #モデルは呼び出し間で共有し、エージェント作成時の初期化を省く
+        if isinstance(model, str):
+            model = BedrockModel(model_id=model)
+        self.model = model
+        self.cache = cache or ToolSchemaCache()
+        self.agent_kwargs = agent_kwargs
+
+    async def create(self, client):
+        """ひな形からサブエージェントを作成"""
+        tools = await self.cache.get_tools(client)
+        return Agent(model=self.model, tools=tools, **self.agent_kwargs)